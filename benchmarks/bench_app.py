@@ -0,0 +1,209 @@
+# Benchmarks for the data loading and map building hot path.
+#
+# Generates synthetic datasets with the schema of US_2024_Import_Data.csv at several
+# sizes and times each stage: CSV parsing (load_data), index building, filtering,
+# point clustering (tariff_map/spatial.py), trace construction in create_bubble_map and
+# create_tariff_animation, the charts of tariff_map/views.py and figure JSON serialization
+# (full, compact and animated).
+#
+#     python benchmarks/bench_app.py                       # all scales
+#     python benchmarks/bench_app.py --scales 233 10000 --output before.json
+#     python benchmarks/bench_app.py --compare before.json --output after.json
+#
+# Results are written as JSON (one record per scale and stage) so runs from different
+# commits can be compared.
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCALES = [233, 10_000, 100_000, 1_000_000]
+
+
+# Synthetic import data: countries (and their swing-state flags) sampled from the real
+# file so every row resolves to coordinates, with random import, export and tariff values
+def synthetic_csv(path, num_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    real = pd.read_csv(os.path.join(REPO_DIR, 'US_2024_Import_Data.csv'), encoding='utf-8-sig')
+    picks = rng.integers(0, len(real), num_rows)
+    frame = pd.DataFrame({
+        'year': 2024,
+        'CTY_CODE': real['CTY_CODE'].to_numpy()[picks],
+        'CTYNAME': real['CTYNAME'].to_numpy()[picks],
+        'Imports ($B)': rng.lognormal(mean=0.0, sigma=2.5, size=num_rows),
+        'Exports ($B)': rng.lognormal(mean=-0.5, sigma=2.5, size=num_rows),
+        'Tariff Rate': [f'{rate}%' for rate in rng.choice([10, 17, 20, 24, 26, 32, 34, 46, 49, 50], num_rows)],
+        'Geopolitical_swing_state': np.where(real['Geopolitical_swing_state'].to_numpy()[picks], 'TRUE', 'FALSE')
+    })
+    frame.to_csv(path, index=False)
+
+
+# Synthetic tariff schedule: weekly effective dates, each changing the rate of a tenth of
+# the countries
+def synthetic_schedule(codes, num_dates=20, seed=0):
+    rng = np.random.default_rng(seed)
+    codes = np.unique(codes)
+    dates = pd.date_range('2025-04-05', periods=num_dates, freq='7D')
+    changed = [rng.choice(codes, max(1, len(codes) // 10), replace=False) for _ in dates]
+    return pd.DataFrame({
+        'CTY_CODE': np.concatenate(changed).astype(np.int32),
+        'Effective Date': np.repeat(dates, [len(codes) for codes in changed]),
+        'Tariff Rate': rng.choice([10, 20, 30, 50, 125], sum(map(len, changed))).astype(np.float32)
+    })
+
+
+def timed(function, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def record(results, scale, stage, times, **extra):
+    results.append({
+        'scale': scale,
+        'stage': stage,
+        'repeat': len(times),
+        'min_s': min(times),
+        'median_s': statistics.median(times),
+        **extra
+    })
+    print(f"{scale:>9} rows  {stage:<28} min {min(times) * 1000:10.2f} ms  median {statistics.median(times) * 1000:10.2f} ms"
+          + ''.join(f"  {key}={value}" for key, value in extra.items()))
+
+
+def bench_scale(core, scale, repeat, workdir):
+    results = []
+    path = os.path.join(workdir, f'imports_{scale}.csv')
+    synthetic_csv(path, scale)
+
+    times, data = timed(lambda: core.read_import_csv(path), repeat)
+    record(results, scale, 'load_data (parse csv)', times, bytes=int(data.memory_usage(deep=True).sum()))
+
+    times, (country_index, _) = timed(lambda: core.build_country_index(data), repeat)
+    record(results, scale, 'build_country_index', times)
+    times, filter_index = timed(lambda: core.FilterIndex(data), repeat)
+    record(results, scale, 'build_filter_index', times)
+
+    # A typical interaction: a narrowed import range and tariff range, no country selection
+    imports = data['Imports ($B)']
+    query = (float(imports.quantile(0.25)), float(imports.quantile(0.75)), 20.0, 40.0, [])
+
+    def mask_filter():
+        return data[
+            (data['Imports ($B)'] >= query[0]) & (data['Imports ($B)'] <= query[1]) &
+            (data['Tariff Rate'] >= query[2]) & (data['Tariff Rate'] <= query[3])
+        ]
+    times, filtered = timed(mask_filter, repeat)
+    record(results, scale, 'filter (masks)', times, rows_out=len(filtered))
+    times, rows = timed(lambda: data.take(filter_index.rows(*query)), repeat)
+    record(results, scale, 'filter (index)', times, rows_out=len(rows))
+
+    # Dense point layer: every row as a point scattered around its country's location,
+    # clustered for the whole world
+    located = country_index.reindex(data['CTY_CODE'].to_numpy())
+    jitter = np.random.default_rng(1).normal(0, 2, (2, len(data)))
+    point_lats = np.clip(located['lat'].to_numpy() + jitter[0], -90, 90)
+    point_lons = (located['lon'].to_numpy() + jitter[1] + 180) % 360 - 180
+    times, pyramid = timed(lambda: core.GridPyramid(point_lats, point_lons, imports.to_numpy(), data['Tariff Rate'].to_numpy()), repeat)
+    record(results, scale, 'build_grid_pyramid', times)
+    times, clusters = timed(lambda: pyramid.clusters(max_points=500), repeat)
+    record(results, scale, 'cluster points (world)', times, bubbles=len(clusters['lat']))
+
+    times, fig = timed(lambda: core.create_bubble_map(data, *query, False, country_index, filter_index), repeat)
+    record(results, scale, 'create_bubble_map', times, points=sum(len(trace.lon or ()) for trace in fig.data[1:3]))
+
+    times, payload = timed(fig.to_json, repeat)
+    record(results, scale, 'figure to_json', times, bytes=len(payload))
+
+    # The compact figure rendered by the app (typed arrays, hover templates)
+    times, compact_fig = timed(lambda: core.create_bubble_map(data, *query, False, country_index, filter_index, compact=True), repeat)
+    record(results, scale, 'create_bubble_map (compact)', times)
+    times, payload = timed(compact_fig.to_json, repeat)
+    record(results, scale, 'compact figure to_json', times, bytes=len(payload))
+
+    # Tariff timeline: every frame in one figure (the tariff range does not apply)
+    schedule = synthetic_schedule(data['CTY_CODE'].to_numpy())
+    times, animation = timed(lambda: core.create_tariff_animation(data, schedule, *query[:2], [], False, country_index, filter_index), repeat)
+    record(results, scale, 'create_tariff_animation', times, frames=len(animation.frames))
+    times, payload = timed(animation.to_json, repeat)
+    record(results, scale, 'animation to_json', times, bytes=len(payload))
+
+    # Charts under the map, from one slice of the matching rows (what cached_views does
+    # when none of them is cached)
+    columns = core.view_slice(data, filter_index.rows(*query))
+    builders = list(core.VIEW_BUILDERS.values())
+    times, _ = timed(lambda: [build(columns) for build in builders], repeat)
+    record(results, scale, 'views', times, views=len(builders))
+    return results
+
+
+def environment():
+    import plotly
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'commit': commit or None,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'plotly': plotly.__version__
+    }
+
+
+# Print the median time ratio of each (scale, stage) against an earlier run
+def compare(previous, results):
+    before = {(row['scale'], row['stage']): row['median_s'] for row in previous['results']}
+    print("\nChange against", previous['environment'].get('commit') or 'previous run')
+    for row in results:
+        old = before.get((row['scale'], row['stage']))
+        if old:
+            print(f"{row['scale']:>9} rows  {row['stage']:<28} {row['median_s'] / old:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark load_data and create_bubble_map across data scales.")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help="Row counts to generate")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage (default: 3)")
+    parser.add_argument('--output', default='bench_output.json', help="JSON results file (default: bench_output.json)")
+    parser.add_argument('--compare', help="Earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    sys.path.insert(0, REPO_DIR)
+    import tariff_map as core
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scales:
+            results.extend(bench_scale(core, scale, args.repeat, workdir))
+
+    with open(output, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if previous:
+        compare(previous, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+# Load test: simulated analysts using the app concurrently in one process.
+#
+# Each session is a streamlit.testing AppTest running app.py in its own thread, as the
+# Streamlit server runs each browser session's reruns in its own thread of the same
+# process (sharing st.cache_resource / st.cache_data). Sessions replay random interaction
+# scripts: dragging the import and tariff sliders (one rerun per step of the drag),
+# picking and clearing countries and toggling the swing-state highlight.
+#
+#     python benchmarks/load_test.py                              # 1, 2, 4, 8 and 16 sessions
+#     python benchmarks/load_test.py --sessions 1 8 32 --actions 40 --think-time 0.5
+#     python benchmarks/load_test.py --rows 100000                # synthetic dataset of that size
+#
+# Every concurrency level runs in a fresh process: one session warms the caches, then all
+# sessions start together. Reported per level: rerun latency percentiles, reruns per
+# second, session start time and resident memory added per session. No network is used;
+# results are also written as JSON.
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_DIR, 'app.py')
+DEFAULT_SESSIONS = [1, 2, 4, 8, 16]
+PERCENTILES = (50, 90, 95, 99)
+
+
+def resident_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def percentile(values, q):
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+class Session:
+    def __init__(self, seed, think_time):
+        from streamlit.testing.v1 import AppTest
+
+        self.random = random.Random(seed)
+        self.think_time = think_time
+        self.app = AppTest.from_file(APP_PATH, default_timeout=120)
+        self.latencies = []
+        self.errors = 0
+        start = time.perf_counter()
+        self.app.run()
+        self.start_seconds = time.perf_counter() - start
+        self._check()
+
+    def _check(self):
+        if self.app.exception:
+            self.errors += 1
+
+    def _rerun(self, widget, value):
+        start = time.perf_counter()
+        widget.set_value(value).run()
+        self.latencies.append(time.perf_counter() - start)
+        self._check()
+
+    def _widget(self, widgets, label):
+        return next(widget for widget in widgets if widget.label == label)
+
+    # Move one end of a range slider to a random point, one rerun per step
+    def drag_slider(self, label):
+        slider = self._widget(self.app.sidebar.slider, label)
+        low, high = slider.value
+        lowest, highest = slider.min, slider.max
+        target = self.random.uniform(lowest, highest)
+        steps = self.random.randint(3, 8)
+        move_low = self.random.random() < 0.5
+        start = low if move_low else high
+        for step in range(1, steps + 1):
+            value = start + (target - start) * step / steps
+            slider = self._widget(self.app.sidebar.slider, label)
+            if move_low:
+                self._rerun(slider, (min(value, high), high))
+            else:
+                self._rerun(slider, (low, max(value, low)))
+
+    def pick_countries(self):
+        countries = self._widget(self.app.sidebar.multiselect, "Countries")
+        if countries.value:
+            self._rerun(countries, [])
+        else:
+            self._rerun(countries, self.random.sample(countries.options, self.random.randint(1, 3)))
+
+    def toggle_swing_states(self):
+        checkbox = self._widget(self.app.sidebar.checkbox, "Highlight Geopolitical Swing States")
+        self._rerun(checkbox, not checkbox.value)
+
+    def play(self, num_actions):
+        actions = [
+            (0.35, lambda: self.drag_slider("Import Value Range (Billion USD)")),
+            (0.35, lambda: self.drag_slider("Tariff Rate Range (%)")),
+            (0.2, self.pick_countries),
+            (0.1, self.toggle_swing_states)
+        ]
+        for _ in range(num_actions):
+            action = self.random.choices([action for _, action in actions], [weight for weight, _ in actions])[0]
+            action()
+            if self.think_time:
+                time.sleep(self.random.expovariate(1 / self.think_time))
+
+
+# AppTest is written for one run at a time: it installs a mock Runtime and patches
+# config.get_option (to report global.appTest) for the duration of each run and removes
+# both afterwards, which breaks runs still going in other threads. Set the option for
+# good and fall back to a mock Runtime of our own while no run has one installed.
+# AppTest also compiles the script in every run; share one bytecode cache between all
+# sessions as the server does (compiling in several threads at once fails on Python 3.11).
+def allow_concurrent_app_tests():
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    config.set_option('global.appTest', True)
+
+    shared_script_cache = ScriptCache()
+
+    def share_script_cache(self):
+        self._cache, self._lock = shared_script_cache._cache, shared_script_cache._lock
+    ScriptCache.__init__ = share_script_cache
+
+    fallback = MagicMock(spec=Runtime)
+    fallback.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    fallback.dataframe_source_mgr = DataframeSourceManager()
+    fallback.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: cls._instance or fallback)
+    Runtime.exists = classmethod(lambda cls: True)
+
+
+# Run one concurrency level in this process and return its measurements
+def run_level(num_sessions, num_actions, think_time, seed):
+    import logging
+
+    logging.disable(logging.WARNING)  # AppTest's bare-mode warnings
+    allow_concurrent_app_tests()
+
+    # Warm the shared caches as a running server would have them
+    Session(seed, 0).play(2)
+    baseline = resident_bytes()
+
+    sessions, failures = [None] * num_sessions, []
+    ready = threading.Barrier(num_sessions + 1)
+
+    def run(i):
+        try:
+            sessions[i] = Session(seed + 1 + i, think_time)
+            ready.wait()
+            sessions[i].play(num_actions)
+        except Exception as error:
+            failures.append(repr(error))
+            ready.abort()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(num_sessions)]
+    for thread in threads:
+        thread.start()
+    try:
+        ready.wait()
+    except threading.BrokenBarrierError:
+        pass
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if failures:
+        raise RuntimeError(f"{len(failures)} sessions failed: {failures[0]}")
+
+    latencies = [latency for session in sessions for latency in session.latencies]
+    result = {
+        'sessions': num_sessions,
+        'reruns': len(latencies),
+        'errors': sum(session.errors for session in sessions),
+        'elapsed_s': elapsed,
+        'reruns_per_s': len(latencies) / elapsed,
+        'mean_s': statistics.mean(latencies),
+        'max_s': max(latencies),
+        'session_start_median_s': statistics.median(session.start_seconds for session in sessions),
+        'memory_per_session_bytes': (resident_bytes() - baseline) / num_sessions
+    }
+    for q in PERCENTILES:
+        result[f'p{q}_s'] = percentile(latencies, q)
+    return result
+
+
+def print_result(row):
+    print(f"{row['sessions']:>8} {row['reruns']:>7} {row['reruns_per_s']:>9.1f}"
+          + ''.join(f" {row[f'p{q}_s'] * 1000:>8.0f}" for q in PERCENTILES)
+          + f" {row['max_s'] * 1000:>8.0f} {row['session_start_median_s'] * 1000:>9.0f}"
+          + f" {row['memory_per_session_bytes'] / 2 ** 20:>9.1f} {row['errors']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay concurrent simulated sessions against app.py and report latency, throughput and memory.")
+    parser.add_argument('--sessions', type=int, nargs='+', default=DEFAULT_SESSIONS, help="Concurrency levels to run")
+    parser.add_argument('--actions', type=int, default=20, help="Interactions per session (default: 20)")
+    parser.add_argument('--think-time', type=float, default=0.0, help="Mean pause between interactions in seconds (default: 0)")
+    parser.add_argument('--rows', type=int, help="Use a synthetic dataset with this many rows instead of the real one")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the interaction scripts (default: 0)")
+    parser.add_argument('--output', default='load_test_output.json', help="JSON results file (default: load_test_output.json)")
+    parser.add_argument('--level', type=int, help=argparse.SUPPRESS)  # run one level in this process
+    args = parser.parse_args()
+
+    if args.level:
+        sys.path.insert(0, REPO_DIR)
+        print(json.dumps(run_level(args.level, args.actions, args.think_time, args.seed)))
+        return
+
+    output = os.path.abspath(args.output)
+    with tempfile.TemporaryDirectory() as workdir:
+        # The app reads its data from the working directory
+        if args.rows:
+            from bench_app import synthetic_csv
+            synthetic_csv(os.path.join(workdir, 'US_2024_Import_Data.csv'), args.rows)
+            data_dir = workdir
+        else:
+            data_dir = REPO_DIR
+
+        print(f"{'sessions':>8} {'reruns':>7} {'reruns/s':>9}" + ''.join(f" {f'p{q} ms':>8}" for q in PERCENTILES)
+              + f" {'max ms':>8} {'start ms':>9} {'MB/sess':>9} {'errors':>6}")
+        results = []
+        for num_sessions in args.sessions:
+            command = [
+                sys.executable, os.path.abspath(__file__), '--level', str(num_sessions),
+                '--actions', str(args.actions), '--think-time', str(args.think_time), '--seed', str(args.seed)
+            ]
+            completed = subprocess.run(command, cwd=data_dir, capture_output=True, text=True)
+            if completed.returncode != 0:
+                sys.exit(f"Level with {num_sessions} sessions failed:\n{completed.stderr}")
+            row = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(row)
+            print_result(row)
+
+    from bench_app import environment
+    with open(output, 'w') as f:
+        json.dump({
+            'environment': {**environment(), 'cpus': os.cpu_count(), 'rows': args.rows, 'actions': args.actions, 'think_time': args.think_time},
+            'results': results
+        }, f, indent=2)
+    print(f"\nWrote {output}")
+
+
+if __name__ == '__main__':
+    main()
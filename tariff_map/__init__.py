@@ -0,0 +1,45 @@
+# Core of the US import and tariff map, usable without Streamlit.
+#
+# Submodules are imported on first use, so `import tariff_map` stays cheap and code that
+# only needs the data (e.g. the scenario engine) never pays for importing plotly.
+import importlib
+
+_EXPORTS = {
+    'country_coords': 'countries',
+    'build_country_index': 'countries',
+    'IMPORT_SCHEMA': 'data_store',
+    'parse_import_csv': 'data_store',
+    'read_import_csv': 'data_store',
+    'read_store': 'data_store',
+    'list_store_years': 'data_store',
+    'load_import_data': 'data_store',
+    'Dataset': 'dataset',
+    'LiveDataset': 'dataset',
+    'FilterIndex': 'filtering',
+    'filter_data': 'filtering',
+    'filter_options': 'filtering',
+    'create_bubble_map': 'figure',
+    'cached_bubble_map': 'figure',
+    'FigureCache': 'figure',
+    'filter_key': 'figure',
+    'create_tariff_animation': 'figure',
+    'Prefetcher': 'prefetch',
+    'neighbor_states': 'prefetch',
+    'read_tariff_schedule': 'timeline',
+    'timeline_rates': 'timeline',
+    'DataTable': 'table',
+    'GridPyramid': 'spatial',
+    'VIEW_BUILDERS': 'views',
+    'cached_views': 'views',
+    'view_slice': 'views',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,204 @@
+# Browser-side filtering for the bubble map.
+#
+# The whole dataset is sent to the browser once, as the per-point columns of the map
+# plus the unfiltered figure used as a template. Import range, tariff range and country
+# selection are then applied by plotly.js in the page, so moving a slider does not
+# trigger a Streamlit rerun or resend the figure.
+import json
+import os
+
+import plotly
+from plotly.utils import PlotlyJSONEncoder
+
+# Trace properties that hold per-point data; they are refilled in the browser
+_POINT_PROPERTIES = ('lon', 'lat', 'text', 'hovertext', 'locations', 'z')
+
+
+# Strip the per-point arrays from the traces so the data is only sent once (in the columns)
+def _template_figure(fig):
+    template = fig.to_plotly_json()
+    template['data'] = [
+        {key: value for key, value in trace.items() if key not in _POINT_PROPERTIES}
+        for trace in template['data']
+    ]
+    for trace in template['data']:
+        marker = trace.get('marker')
+        if marker is not None:
+            trace['marker'] = {key: value for key, value in marker.items() if key not in ('size', 'color')}
+    return template
+
+
+def _columns_payload(columns):
+    return {
+        'ctyname': columns['ctyname'].tolist(),
+        'country': columns['country'].tolist(),
+        'label': columns['label'].tolist(),
+        'iso3': [iso3 if isinstance(iso3, str) else None for iso3 in columns['iso3']],
+        'lat': columns['lat'].tolist(),
+        'lon': columns['lon'].tolist(),
+        'imports': columns['imports'].tolist(),
+        'tariff': columns['tariff'].tolist(),
+        'swing': columns['swing'].tolist(),
+        'size': columns['size'].tolist(),
+        'hover': columns['hover'].tolist()
+    }
+
+
+# plotly.js of the installed plotly version on the public CDN
+def cdn_plotly_js_url():
+    return f"https://cdn.plot.ly/plotly-{plotly.offline.get_plotlyjs_version()}.min.js"
+
+
+# Write the plotly.js bundled with the plotly package into directory, once per version,
+# and return its file name (for serving it from the app instead of the CDN)
+def write_plotly_js(directory):
+    name = f"plotly-{plotly.offline.get_plotlyjs_version()}.min.js"
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        partial = f"{path}.{os.getpid()}.tmp"
+        with open(partial, 'w', encoding='utf-8') as f:
+            f.write(plotly.offline.get_plotlyjs())
+        os.replace(partial, path)
+    return name
+
+
+# Build the self-contained HTML page for st.components.v1.html.
+# fig is the unfiltered map (create_bubble_map with the full ranges) and columns the
+# matching bubble_columns() output; bounds are the (min, max) of each range control.
+# plotly_js_url defaults to the CDN; the page shows an error if it cannot be loaded.
+def client_map_html(fig, columns, import_bounds, tariff_bounds, countries, highlight_swing_states=False, plotly_js_url=None):
+    payload = {
+        'figure': _template_figure(fig),
+        'columns': _columns_payload(columns),
+        'importBounds': list(import_bounds),
+        'tariffBounds': list(tariff_bounds),
+        'countries': list(countries),
+        'highlightSwingStates': bool(highlight_swing_states)
+    }
+    return (
+        _PAGE_TEMPLATE
+        .replace('__PLOTLY_JS_URL__', plotly_js_url or cdn_plotly_js_url())
+        .replace('__PAYLOAD__', json.dumps(payload, cls=PlotlyJSONEncoder).replace('</', '<\\/'))
+    )
+
+
+_PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<script src="__PLOTLY_JS_URL__"></script>
+<style>
+  body { margin: 0; font-family: "Source Sans Pro", sans-serif; font-size: 14px; }
+  .controls { display: flex; gap: 24px; align-items: flex-start; padding: 4px 8px; }
+  .controls fieldset { border: 1px solid #ddd; border-radius: 4px; }
+  .controls input[type=range] { width: 180px; display: block; }
+  .controls select { min-width: 220px; }
+  .error { color: #b00020; padding: 8px; }
+</style>
+</head>
+<body>
+<div class="controls">
+  <fieldset>
+    <legend>Import Value Range (Billion USD): <span id="import-label"></span></legend>
+    <input type="range" id="import-min"><input type="range" id="import-max">
+  </fieldset>
+  <fieldset>
+    <legend>Tariff Rate Range (%): <span id="tariff-label"></span></legend>
+    <input type="range" id="tariff-min"><input type="range" id="tariff-max">
+  </fieldset>
+  <fieldset>
+    <legend>Countries (none selected = all)</legend>
+    <select id="countries" multiple size="4"></select>
+  </fieldset>
+</div>
+<div id="map"></div>
+<script>
+const payload = __PAYLOAD__;
+const columns = payload.columns;
+const figure = payload.figure;
+const highlight = payload.highlightSwingStates;
+
+function setupRange(prefix, bounds) {
+  for (const [suffix, value] of [['min', bounds[0]], ['max', bounds[1]]]) {
+    const input = document.getElementById(prefix + '-' + suffix);
+    input.min = bounds[0];
+    input.max = bounds[1];
+    input.step = (bounds[1] - bounds[0]) / 1000 || 1;
+    input.value = value;
+    input.addEventListener('input', render);
+  }
+}
+
+function readRange(prefix) {
+  const a = parseFloat(document.getElementById(prefix + '-min').value);
+  const b = parseFloat(document.getElementById(prefix + '-max').value);
+  return a <= b ? [a, b] : [b, a];
+}
+
+setupRange('import', payload.importBounds);
+setupRange('tariff', payload.tariffBounds);
+const countrySelect = document.getElementById('countries');
+for (const name of payload.countries) {
+  countrySelect.add(new Option(name, name));
+}
+countrySelect.addEventListener('change', render);
+
+function render() {
+  const [minImports, maxImports] = readRange('import');
+  const [minTariff, maxTariff] = readRange('tariff');
+  const selected = new Set(Array.from(countrySelect.selectedOptions, option => option.value));
+  document.getElementById('import-label').textContent = '$' + minImports.toFixed(2) + ' - $' + maxImports.toFixed(2);
+  document.getElementById('tariff-label').textContent = minTariff.toFixed(1) + '% - ' + maxTariff.toFixed(1) + '%';
+
+  // Same filter as create_bubble_map
+  const regular = [], swing = [];
+  for (let i = 0; i < columns.imports.length; i++) {
+    if (columns.imports[i] < minImports || columns.imports[i] > maxImports) continue;
+    if (columns.tariff[i] < minTariff || columns.tariff[i] > maxTariff) continue;
+    if (selected.size > 0 && !selected.has(columns.ctyname[i])) continue;
+    (columns.swing[i] ? swing : regular).push(i);
+  }
+  const pick = (name, rows) => rows.map(i => columns[name][i]);
+  const swingIso3 = swing
+    .filter(i => columns.country[i] !== 'China' && columns.country[i] !== 'United States' && columns.iso3[i])
+    .map(i => columns.iso3[i]);
+
+  const traces = [];
+  for (const template of figure.data) {
+    const trace = JSON.parse(JSON.stringify(template));
+    if (trace.type === 'choropleth') {
+      trace.locations = ['CHN', 'USA'].concat(swingIso3);
+      trace.z = [1, 2].concat(swingIso3.map(() => 3));
+      trace.text = ['China', 'United States'].concat(pick('country', swing));
+    } else if (trace.type === 'scattergeo') {
+      const rows = trace.name === 'Geopolitical Swing States' ? swing : regular;
+      if (trace.name !== 'Geopolitical Swing States' && highlight && rows.length === 0) continue;
+      trace.lon = pick('lon', rows);
+      trace.lat = pick('lat', rows);
+      trace.text = pick('label', rows);
+      trace.hovertext = trace.hoverinfo === 'none' ? null : pick('hover', rows);
+      trace.marker.size = pick('size', rows);
+      trace.marker.color = pick('tariff', rows);
+      trace.marker.cmin = minTariff;
+    } else if (trace.marker) {
+      trace.marker.cmin = minTariff;
+    }
+    traces.push(trace);
+  }
+  Plotly.react('map', traces, figure.layout, {responsive: true});
+}
+
+if (typeof Plotly === 'undefined') {
+  const error = document.createElement('div');
+  error.className = 'error';
+  error.textContent = 'The map could not be drawn: plotly.js failed to load from __PLOTLY_JS_URL__.';
+  document.getElementById('map').replaceWith(error);
+  document.querySelector('.controls').remove();
+} else {
+  render();
+}
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,257 @@
+# Year-partitioned columnar store for the US import data.
+#
+# Convert one or more yearly CSVs (same columns as US_2024_Import_Data.csv) with:
+#
+#     python -m tariff_map.data_store US_2023_Import_Data.csv US_2024_Import_Data.csv
+#
+# Each year is written to its own Parquet partition (import_data_store/year=2024/...).
+# The app then memory-maps only the partitions for the years being viewed, so adding
+# history does not slow down cold starts or grow worker memory.
+import argparse
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+STORE_DIR = 'import_data_store'
+DEFAULT_CSV = 'US_2024_Import_Data.csv'
+
+
+# Columns of the import data and the types they are parsed into. Country names repeat on
+# every row of a country and become categories, the swing-state flag a real bool, and the
+# dollar and percent values float32 (7 significant digits: well below a cent of the
+# billions and the percent rates the app shows).
+IMPORT_SCHEMA = {
+    'year': 'int16',
+    'CTY_CODE': 'int32',
+    'CTYNAME': 'category',
+    'Imports ($B)': 'float32',
+    'Exports ($B)': 'float32',
+    'Tariff Rate': 'float32',  # "10%" in the CSV
+    'Geopolitical_swing_state': 'bool',  # TRUE / FALSE in the CSV
+}
+# Rows whose year or country code is missing or invalid cannot be placed and are dropped,
+# as are rows without a country name (they could not be labeled or selected)
+KEY_COLUMNS = ('year', 'CTY_CODE')
+REQUIRED_COLUMNS = KEY_COLUMNS + ('CTYNAME',)
+BOOL_VALUES = {'true': 1.0, 'false': 0.0, '1': 1.0, '0': 0.0}
+
+logger = logging.getLogger(__name__)
+
+
+# Parse a column read as categories one distinct value at a time (tariff rates and flags
+# take a few dozen values however many rows there are). parse maps the stripped strings to
+# floats, NaN when invalid. Returns the values per row and a mask of the invalid ones.
+def _parse_distinct(raw, parse):
+    codes = raw.cat.codes.to_numpy()
+    parsed = parse(pd.Series(raw.cat.categories.astype(str)).str.strip()).to_numpy(dtype=float)
+    values = np.append(parsed, np.nan)[codes]  # code -1 (missing) takes the NaN
+    return values, (codes >= 0) & np.isnan(values)
+
+
+def _parse_percent(values):
+    return pd.to_numeric(values.str.removesuffix('%'), errors='coerce')
+
+
+def _parse_bool(values):
+    return values.str.lower().map(BOOL_VALUES)
+
+
+# Names of a column read as categories, stripped, with sorted categories. Returns the
+# categorical and a mask of the rows without a name (missing or blank).
+def _parse_names(raw):
+    names = pd.Series(raw.cat.categories.astype(str)).str.strip()
+    codes, uniques = pd.factorize(names.where(names != ''), sort=True)
+    codes = np.append(codes, -1)[raw.cat.codes.to_numpy()]  # code -1 (missing) stays missing
+    return pd.Categorical.from_codes(codes, categories=uniques), codes < 0
+
+
+# Percent rates ("10%") of a column read as categories: float values (NaN when missing
+# or invalid) and a mask of the invalid ones
+def parse_rate_column(raw):
+    return _parse_distinct(raw, _parse_percent)
+
+
+# One row per value that did not parse: data row (1-based, not counting the header or
+# the blank lines read_csv skips), column, raw value and what was done with it
+def _bad_rows(raw, invalid):
+    frames = []
+    for name, rows in invalid.items():
+        dtype = IMPORT_SCHEMA[name]
+        outcome = 'row dropped' if name in REQUIRED_COLUMNS else 'set to False' if dtype == 'bool' else 'set to missing'
+        frames.append(pd.DataFrame({
+            'row': np.flatnonzero(rows) + 1,
+            'column': name,
+            'value': raw[name][rows].astype(object).fillna('').astype(str).to_numpy(),
+            'problem': f"missing, {outcome}" if dtype == 'category' else f"not a valid {dtype}, {outcome}"
+        }))
+    if not frames:
+        return pd.DataFrame({'row': np.array([], dtype=np.int64), 'column': [], 'value': [], 'problem': []})
+    return pd.concat(frames, ignore_index=True).sort_values(['row', 'column'], ignore_index=True)
+
+
+# Parse an import data CSV into the types of IMPORT_SCHEMA (other columns are kept as
+# read). Returns the data and the bad values (see _bad_rows): rows with a bad key or
+# without a country name are dropped, other bad values become missing (False for the
+# swing state).
+def parse_import_csv(path=DEFAULT_CSV):
+    # Text columns are read as categories, so each distinct value is parsed once
+    raw = pd.read_csv(path, dtype=dict.fromkeys(['CTYNAME', 'Tariff Rate', 'Geopolitical_swing_state'], 'category'))
+    missing = [name for name in IMPORT_SCHEMA if name not in raw.columns]
+    if missing:
+        raise ValueError(f"{path} is missing the columns {missing}")
+
+    values, invalid = {}, {}
+    for name, dtype in IMPORT_SCHEMA.items():
+        column = raw[name]
+        if dtype == 'category':
+            parsed, bad = _parse_names(column)
+        elif name == 'Tariff Rate':
+            parsed, bad = parse_rate_column(column)
+        elif dtype == 'bool':
+            parsed, bad = _parse_distinct(column, _parse_bool)
+        else:
+            # Numbers are parsed by read_csv itself unless the column holds text
+            parsed = pd.to_numeric(column, errors='coerce').to_numpy(dtype=float)
+            bad = column.notna().to_numpy() & np.isnan(parsed)
+        if name in KEY_COLUMNS:
+            bad = bad | np.isnan(parsed) | (parsed != np.round(parsed))
+        values[name] = parsed == 1.0 if dtype == 'bool' else parsed
+        if bad.any():
+            invalid[name] = bad
+
+    keep = np.ones(len(raw), dtype=bool)
+    for name in REQUIRED_COLUMNS:
+        if name in invalid:
+            keep &= ~invalid[name]
+    data = pd.DataFrame({
+        **{name: column[keep].astype(IMPORT_SCHEMA[name]) for name, column in values.items()},
+        **{name: raw[name].array[keep] for name in raw.columns if name not in IMPORT_SCHEMA}
+    })
+    return data, _bad_rows(raw, invalid)
+
+
+# Read an import data CSV, logging the values that did not parse
+def read_import_csv(path=DEFAULT_CSV):
+    data, bad_rows = parse_import_csv(path)
+    if len(bad_rows):
+        logger.warning("%s: %d bad values\n%s", path, len(bad_rows), bad_rows.head(20).to_string(index=False))
+    return data
+
+
+# Read-only version of a loaded frame, for holding one copy per process and sharing it
+# between sessions (st.cache_resource). Every column keeps its own array and the NumPy
+# ones (and the codes of categorical ones) are marked read-only (Arrow-backed string
+# columns are immutable already), so an accidental in-place write raises instead of
+# changing the data seen by other sessions.
+def freeze_frame(df):
+    columns = {}
+    for name, column in df.items():
+        if isinstance(column.array, pd.arrays.NumpyExtensionArray):
+            values = column.to_numpy(copy=True)
+            values.flags.writeable = False
+            columns[name] = values
+        elif isinstance(column.dtype, pd.CategoricalDtype):
+            codes = column.cat.codes.to_numpy(copy=True)
+            codes.flags.writeable = False
+            columns[name] = pd.Categorical.from_codes(codes, dtype=column.dtype, validate=False)
+        else:
+            columns[name] = column.array
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def _partition_dir(store_dir, year):
+    return os.path.join(store_dir, f'year={year}')
+
+
+# Years available in the store, oldest first
+def list_store_years(store_dir=STORE_DIR):
+    if not os.path.isdir(store_dir):
+        return []
+    years = []
+    for entry in os.listdir(store_dir):
+        if entry.startswith('year=') and entry[5:].isdigit():
+            years.append(int(entry[5:]))
+    return sorted(years)
+
+
+# Convert CSVs into the store, replacing the partitions of every year they contain
+def write_store(csv_paths, store_dir=STORE_DIR):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    written = []
+    for path in csv_paths:
+        df = read_import_csv(path)
+        for year, year_df in df.groupby('year', sort=True):
+            partition = _partition_dir(store_dir, year)
+            os.makedirs(partition, exist_ok=True)
+            table = pa.Table.from_pandas(year_df.reset_index(drop=True), preserve_index=False)
+            # Write next to the old file and swap, so readers never see a partial partition
+            target = os.path.join(partition, 'data.parquet')
+            pq.write_table(table, target + '.tmp')
+            os.replace(target + '.tmp', target)
+            written.append((int(year), len(year_df)))
+    return written
+
+
+# Read the given years (all years when empty) from the store, memory-mapping each partition
+def read_store(store_dir=STORE_DIR, years=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    available = list_store_years(store_dir)
+    if years:
+        missing = sorted(set(years) - set(available))
+        if missing:
+            raise FileNotFoundError(f"No partitions for years {missing} in {store_dir}")
+        available = [year for year in available if year in set(years)]
+    if not available:
+        raise FileNotFoundError(f"No partitions found in {store_dir}")
+
+    tables = [
+        pq.read_table(os.path.join(_partition_dir(store_dir, year), 'data.parquet'), memory_map=True)
+        for year in available
+    ]
+    table = pa.concat_tables(tables)
+    data = table.to_pandas(split_blocks=True, self_destruct=True)
+    # Categories of several partitions are merged in file order; keep them sorted as
+    # parse_import_csv does
+    for name, column in data.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            data[name] = column.cat.reorder_categories(sorted(column.cat.categories))
+    return data
+
+
+# Load the import data for the given years (all when empty): from the store when it has
+# been built, otherwise from the CSV
+def load_import_data(years=None, store_dir=STORE_DIR, csv_path=DEFAULT_CSV):
+    if list_store_years(store_dir):
+        return read_store(store_dir, years)
+    return read_import_csv(csv_path)
+
+
+# Files read by load_import_data for the same arguments
+def import_data_paths(years=None, store_dir=STORE_DIR, csv_path=DEFAULT_CSV):
+    available = list_store_years(store_dir)
+    if not available:
+        return [csv_path]
+    return [
+        os.path.join(_partition_dir(store_dir, year), 'data.parquet')
+        for year in available if not years or year in set(years)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert yearly import CSVs into the year-partitioned Parquet store.")
+    parser.add_argument('csv_paths', nargs='+', help="CSV files with the columns of US_2024_Import_Data.csv")
+    parser.add_argument('--store-dir', default=STORE_DIR, help=f"Output directory (default: {STORE_DIR})")
+    args = parser.parse_args()
+
+    for year, rows in write_store(args.csv_paths, args.store_dir):
+        print(f"year={year}: {rows} rows")
+
+
+if __name__ == '__main__':
+    main()
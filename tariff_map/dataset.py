@@ -0,0 +1,212 @@
+# Loaded datasets and hot reloading of their source files.
+#
+# A Dataset is one immutable version of the import data together with the indexes the
+# queries need (country locations, FilterIndex, filter options). A LiveDataset holds the
+# current Dataset for a source and replaces it when the source files change:
+#
+# - the files are fingerprinted by content (SHA-256), so rewriting or touching them with
+#   the same content does nothing, and a change is only read once the files have stopped
+#   changing between two checks (no half-written CSVs)
+# - the new rows are diffed against the loaded ones by (year, CTY_CODE); when the same
+#   rows are present, the new Dataset keeps the row positions and updates the FilterIndex
+#   for the changed rows only, otherwise it is rebuilt
+# - listeners receive the old and new Dataset and the changed rows (both versions), so
+#   caches can drop only what those rows affect
+#
+# Readers take `live.current` once and use that Dataset throughout, so a reload never
+# mixes two versions in one rerun or request.
+import hashlib
+import itertools
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .countries import build_country_index
+from .data_store import freeze_frame
+from .filtering import FilterIndex, filter_options
+
+RELOAD_INTERVAL_ENV = 'TARIFF_MAP_RELOAD_INTERVAL'
+DEFAULT_RELOAD_INTERVAL = 1.0
+
+logger = logging.getLogger(__name__)
+
+# Versions are unique across all datasets of the process
+_versions = itertools.count(1)
+
+
+class Dataset:
+    def __init__(self, data, country_index=None, unresolved=None, filter_index=None):
+        self.version = next(_versions)
+        self.data = freeze_frame(data)
+        if country_index is None:
+            country_index, unresolved = build_country_index(self.data)
+        self.country_index, self.unresolved = country_index, unresolved
+        self.filter_index = filter_index if filter_index is not None else FilterIndex(self.data)
+        self.options = filter_options(self.data)
+
+    # New version of this dataset where only the rows at the given positions changed
+    def with_changed_rows(self, data, rows):
+        country_index, unresolved = self.country_index, self.unresolved
+        # Country locations only need resolving again when a changed row was renamed
+        old_names = self.data['CTYNAME'].take(rows).reset_index(drop=True)
+        if not data['CTYNAME'].take(rows).reset_index(drop=True).equals(old_names):
+            country_index, unresolved = build_country_index(data)
+        return Dataset(data, country_index, unresolved, self.filter_index.updated(data, rows))
+
+
+def _row_keys(data):
+    return ['year', 'CTY_CODE'] if 'year' in data.columns else ['CTY_CODE']
+
+
+# Compare two versions of the data by (year, CTY_CODE). Returns the new data aligned to
+# the old row order and the positions of the changed rows when both hold the same rows,
+# or (None, None) when rows were added, removed or keys are not unique.
+def align_rows(old, new):
+    keys = _row_keys(old)
+    if list(new.columns) != list(old.columns) or keys != _row_keys(new) or len(old) != len(new):
+        return None, None
+    old_keys = pd.MultiIndex.from_frame(old[keys])
+    new_keys = pd.MultiIndex.from_frame(new[keys])
+    if not old_keys.is_unique or not new_keys.is_unique:
+        return None, None
+    positions = new_keys.get_indexer(old_keys)
+    if (positions < 0).any():
+        return None, None
+
+    aligned = new.take(positions).reset_index(drop=True)
+    different = np.zeros(len(old), dtype=bool)
+    for name in old.columns:
+        before, after = old[name].reset_index(drop=True), aligned[name]
+        if before.dtype != after.dtype:  # e.g. country names with a new category
+            before, after = before.astype(object), after.astype(object)
+        different |= ~((before == after) | (before.isna() & after.isna())).to_numpy(dtype=bool)
+    return aligned, np.flatnonzero(different)
+
+
+# Old and new versions of the rows that differ between two datasets, with a 'version'
+# column ('old' / 'new'); rows present in only one of them appear once
+def changed_rows(old, new, rows=None):
+    if rows is not None:
+        return pd.concat([
+            old.take(rows).assign(version='old'),
+            new.take(rows).assign(version='new')
+        ], ignore_index=True)
+    merged = old.merge(new, how='outer', on=list(old.columns), indicator=True)
+    merged = merged[merged['_merge'] != 'both']
+    return merged.assign(
+        version=np.where(merged['_merge'] == 'left_only', 'old', 'new')
+    ).drop(columns='_merge').sort_values(_row_keys(old), ignore_index=True)
+
+
+# SHA-256 over the contents of the files, in order
+def fingerprint(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.fsencode(path) + b'\0')
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _stat_signature(paths):
+    signature = []
+    for path in paths:
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature.append((path, info.st_size, info.st_mtime_ns))
+    return tuple(signature)
+
+
+def reload_interval_from_environment():
+    value = os.environ.get(RELOAD_INTERVAL_ENV)
+    return DEFAULT_RELOAD_INTERVAL if value is None else float(value)
+
+
+class LiveDataset:
+    # load() returns the data as a DataFrame and paths() the files it is read from
+    def __init__(self, load, paths):
+        self._load = load
+        self._paths = paths
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.last_error = None
+
+        files = paths()
+        self._signature = _stat_signature(files)
+        self._pending_signature = None
+        self._fingerprint = fingerprint(files)
+        self.current = Dataset(load())
+
+    @property
+    def version(self):
+        return self.current.version
+
+    # listener(old_dataset, new_dataset, changed) is called after each reload, before the
+    # new dataset becomes current; changed is the changed_rows() frame
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    # Check the source files and reload them if their content changed. Returns True when
+    # a new version was loaded.
+    def refresh(self):
+        with self._lock:
+            files = self._paths()
+            signature = _stat_signature(files)
+            if signature is None or signature == self._signature:
+                self._pending_signature = None
+                return False
+            # Wait until the files have stopped changing before reading them
+            if signature != self._pending_signature:
+                self._pending_signature = signature
+                return False
+            self._signature, self._pending_signature = signature, None
+
+            content = fingerprint(files)
+            if content == self._fingerprint:
+                return False
+            new_data = self._load()
+            self._fingerprint = content
+
+            old = self.current
+            aligned, rows = align_rows(old.data, new_data)
+            if aligned is None:
+                new = Dataset(new_data)
+                changed = changed_rows(old.data, new.data)
+            elif len(rows) == 0:
+                return False
+            else:
+                new = old.with_changed_rows(aligned, rows)
+                changed = changed_rows(old.data, new.data, rows)
+
+            for listener in self._listeners:
+                listener(old, new, changed)
+            self.current = new
+            logger.info("Reloaded %s: version %d, %d changed rows", files, new.version, len(changed))
+            return True
+
+    # Check the source files every interval seconds in a background thread
+    def start(self, interval=DEFAULT_RELOAD_INTERVAL):
+        if self._thread is not None or interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._watch, args=(interval,), name='tariff-map-reload', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as error:  # keep serving the loaded version
+                self.last_error = error
+                logger.exception("Reloading the import data failed")
@@ -0,0 +1,502 @@
+# Construction of the bubble map figure.
+import functools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from .countries import build_country_index
+from .filtering import FilterIndex, filter_data
+from .instrumentation import stage
+from .timeline import timeline_rates
+
+# Layout shared by every rendering of the map. Only the traces depend on the
+# filters, so the layout is built (and validated by plotly) once per process
+# and reused across sessions.
+@functools.lru_cache(maxsize=None)
+def base_map_layout():
+    return go.Layout(
+        title=dict(
+            text="US Imports and Tariff Rates by Country",
+            font=dict(size=24)
+        ),
+        showlegend=False,
+        geo=dict(
+            projection_type='natural earth',
+            showland=True,
+            landcolor='rgb(243, 243, 243)',
+            countrycolor='rgb(204, 204, 204)',
+            showocean=True,
+            oceancolor='rgb(158, 202, 225)',
+            showlakes=True,
+            lakecolor='rgb(158, 202, 225)',
+            showrivers=True,
+            rivercolor='rgb(158, 202, 225)',
+            showcountries=True,
+            showcoastlines=True,
+            coastlinecolor='rgb(80, 80, 80)',
+            coastlinewidth=0.5
+        ),
+        height=700,
+        margin=dict(l=0, r=0, t=50, b=0),
+        # Hide axes and gridlines
+        xaxis=dict(visible=False, showgrid=False),
+        yaxis=dict(visible=False, showgrid=False),
+        plot_bgcolor='rgba(0,0,0,0)'  # Transparent background
+    )
+
+# Calculate bubble size based on import value (logarithmic scale for better visualization)
+def bubble_size(imports):
+    # Handle very small values; use log scale for large values to cover the wide range
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_sizes = 5 + 8 * np.log2(imports)
+    return np.select(
+        [imports < 1, imports < 10, imports < 100],
+        [5, 10, 20],
+        default=log_sizes
+    )
+
+# Compute the per-point columns of the bubble map for already filtered rows, or for the
+# given row positions of filtered_df (e.g. from FilterIndex.rows) without copying the frame.
+# Rows without coordinates are dropped; every returned array has one entry per bubble.
+# The formatted hover strings are only built when hover_text is set ('hover' is None otherwise).
+# 'label' names the bubble: the country, followed by the year when the rows span several
+# years (a country then has one bubble per year, all at the same place).
+def bubble_columns(filtered_df, country_index, hover_text=True, rows=None):
+    def column(name, dtype=None):
+        values = filtered_df[name]
+        if rows is not None:
+            values = values.take(rows)
+        return values.to_numpy(dtype=dtype)
+    
+    # Attach canonical name, coordinates and ISO3 code by CTY_CODE, skipping unknown countries
+    located = country_index.reindex(column('CTY_CODE'))
+    has_coords = located['lat'].notna().to_numpy()
+    
+    lats = located['lat'].to_numpy(dtype=float)[has_coords]
+    lons = located['lon'].to_numpy(dtype=float)[has_coords]
+    country_names = located['country'].to_numpy()[has_coords]
+    iso3_codes = located['iso3'].to_numpy()[has_coords]
+    # Sizes are computed in double precision; tariff rates keep their (float32) type so
+    # they print as in the data ("12.3", not "12.300000190734863")
+    imports = column('Imports ($B)', dtype=float)[has_coords]
+    tariff_rates = column('Tariff Rate')[has_coords]
+    is_swing_state = column('Geopolitical_swing_state', dtype=bool)[has_coords]
+    
+    bubble_sizes = bubble_size(imports)
+    
+    labels = country_names
+    if 'year' in filtered_df.columns:
+        years = column('year')[has_coords]
+        if len(years) and years.min() != years.max():
+            labels = (pd.Series(country_names, dtype=object) + " (" + pd.Series(years).astype(str) + ")").to_numpy()
+    
+    hover_texts = None
+    if hover_text:
+        hover_texts = (
+            "Country: " + pd.Series(labels, dtype=object) + "<br>" +
+            "Imports: $" + pd.Series(imports).map('{:,.2f}'.format) + " Billion<br>" +
+            "Tariff Rate: " + pd.Series(tariff_rates).map(str) + "%<br>" +
+            "Geopolitical Swing State: " + np.where(is_swing_state, 'Yes', 'No')
+        ).to_numpy()
+    
+    return {
+        'ctyname': column('CTYNAME', dtype=object)[has_coords],
+        'country': country_names,
+        'label': labels,
+        'iso3': iso3_codes,
+        'lat': lats,
+        'lon': lons,
+        'imports': imports,
+        'tariff': tariff_rates,
+        'swing': is_swing_state,
+        'size': bubble_sizes,
+        'hover': hover_texts
+    }
+
+# Hover label of the compact bubbles, filled in by plotly.js from each point's text
+# (label), customdata (imports) and marker color (tariff rate). The colors arrive as
+# float32, so the rate is rounded to 4 decimals with trailing zeros trimmed: "12.3", not
+# "12.300000190734863", and "25", as in the full figure's hover.
+def _compact_hovertemplate(swing_state):
+    return (
+        "Country: %{text}<br>"
+        "Imports: $%{customdata:,.2f} Billion<br>"
+        "Tariff Rate: %{marker.color:.4~f}%<br>"
+        "Geopolitical Swing State: " + ('Yes' if swing_state else 'No') +
+        "<extra></extra>"
+    )
+
+# Shared color axis of the compact bubbles (tariff rate)
+def _compact_coloraxis(cmin, cmax=50):
+    return dict(
+        colorscale='Hot_r',
+        cmin=cmin,
+        cmax=cmax,
+        colorbar=dict(
+            title="Tariff Rate (%)",
+            thickness=15,
+            len=0.5,
+            y=0.5
+        )
+    )
+
+# Swing-state flag and name of each bubble trace; the regular bubbles are hidden when
+# highlighting swing states, so they are left out
+def _bubble_groups(highlight_swing_states):
+    groups = [(True, 'Geopolitical Swing States')]
+    if not highlight_swing_states:
+        groups.insert(0, (False, 'Regular Countries'))
+    return groups
+
+# Compact bubble trace for the bubbles selected by rows (a mask over the columns)
+def _compact_bubble_trace(columns, rows, swing_state, name):
+    return go.Scattergeo(
+        lon=columns['lon'][rows].astype(np.float32),
+        lat=columns['lat'][rows].astype(np.float32),
+        mode='markers',
+        marker=dict(
+            size=columns['size'][rows].astype(np.float32),
+            color=columns['tariff'][rows].astype(np.float32),
+            coloraxis='coloraxis',
+            opacity=0.7,
+            line=dict(width=1, color='black')
+        ),
+        text=columns['label'][rows],
+        customdata=columns['imports'][rows].astype(np.float32),
+        hovertemplate=_compact_hovertemplate(swing_state),
+        name=name
+    )
+
+# Bubbles of the compact figure. Numeric arrays are sent as float32 typed arrays
+# (base64 in the figure JSON), the hover label is one template per trace instead of a
+# string per point, and the colorbar comes from a shared coloraxis instead of a dummy trace.
+def _add_compact_bubbles(fig, columns, min_tariff, highlight_swing_states):
+    fig.layout.coloraxis = _compact_coloraxis(min_tariff)
+    
+    is_swing_state = columns['swing']
+    for swing_state, name in _bubble_groups(highlight_swing_states):
+        rows = is_swing_state if swing_state else ~is_swing_state
+        fig.add_trace(_compact_bubble_trace(columns, rows, swing_state, name))
+
+# Bubble trace for spatial.GridPyramid.clusters(): sized by summed imports and colored by
+# tariff rate like the country bubbles (add it to a compact map, which has the coloraxis)
+def cluster_trace(clusters, name='Ports'):
+    counts = clusters['count']
+    return go.Scattergeo(
+        lon=clusters['lon'].astype(np.float32),
+        lat=clusters['lat'].astype(np.float32),
+        mode='markers',
+        marker=dict(
+            size=bubble_size(clusters['imports']).astype(np.float32),
+            color=clusters['tariff'].astype(np.float32),
+            coloraxis='coloraxis',
+            opacity=0.7,
+            line=dict(width=1, color='black')
+        ),
+        customdata=np.column_stack([clusters['imports'], counts]).astype(np.float32),
+        hovertemplate=(
+            "Points: %{customdata[1]:,}<br>"
+            "Imports: $%{customdata[0]:,.2f} Billion<br>"
+            "Tariff Rate: %{marker.color:.1f}%"
+            "<extra></extra>"
+        ),
+        name=name
+    )
+
+# Country shading under the bubbles: China red, the United States blue and the swing
+# states among the bubbles purple
+def _add_country_shading(fig, columns, compact=False):
+    is_swing_state = columns['swing']
+    swing_country_names = columns['country'][is_swing_state].tolist()
+    
+    # Prepare country codes for choropleth
+    # Get ISO3 codes for swing states (excluding China and USA which have special colors)
+    swing_iso3 = columns['iso3'][is_swing_state]
+    swing_country_iso3 = [
+        iso3 for country, iso3 in zip(swing_country_names, swing_iso3)
+        if country not in ('China', 'United States') and isinstance(iso3, str)
+    ]
+    
+    # Add special choropleth for China (red), United States (blue), and swing states (purple)
+    fig.add_trace(go.Choropleth(
+        locations=['CHN', 'USA'] + swing_country_iso3,
+        z=[1, 2] + [3] * len(swing_country_iso3),  # Different values for different colors
+        # Hover is skipped on the choropleth, so the compact figure leaves the names out
+        text=None if compact else ['China', 'United States'] + swing_country_names,
+        colorscale=[
+            [0, 'rgb(220,20,60)'],    # Red for China (z=1)
+            [0.5, 'rgb(30,144,255)'], # Blue for USA (z=2)
+            [1, 'rgb(128,0,128)']     # Purple for swing states (z=3)
+        ],
+        showscale=False,
+        marker_line_color='darkgray',
+        marker_line_width=0.5,
+        showlegend=False,
+        hoverinfo='skip'
+    ))
+
+# Function to create the bubble map visualization
+# With compact set, the figure carries the same map in a much smaller JSON payload
+# (see _add_compact_bubbles); the hover labels format tariff rates without a trailing '.0'.
+def create_bubble_map(data, min_imports, max_imports, min_tariff, max_tariff, selected_countries, highlight_swing_states=False, country_index=None, filter_index=None, compact=False):
+    # Filter data based on selections. With an index only the matching row positions are
+    # looked up, and the columns below read those rows straight from the shared data.
+    with stage('filter'):
+        if filter_index is not None:
+            filtered_df, rows = data, filter_index.rows(min_imports, max_imports, min_tariff, max_tariff, selected_countries)
+        else:
+            filtered_df, rows = filter_data(data, min_imports, max_imports, min_tariff, max_tariff, selected_countries), None
+    
+    # Create figure on top of the shared layout
+    fig = go.Figure(layout=base_map_layout())
+    
+    if country_index is None:
+        country_index, _ = build_country_index(data)
+    with stage('columns'):
+        columns = bubble_columns(filtered_df, country_index, hover_text=not compact, rows=rows)
+    lats, lons = columns['lat'], columns['lon']
+    country_names = columns['label']
+    tariff_rates, is_swing_state = columns['tariff'], columns['swing']
+    bubble_sizes, hover_texts = columns['size'], columns['hover']
+    
+    # Split the columns into regular and star-shaped bubbles (geopolitical swing states)
+    is_regular = ~is_swing_state
+    swing_country_names = country_names[is_swing_state].tolist()
+    
+    _add_country_shading(fig, columns, compact)
+    
+    if compact:
+        _add_compact_bubbles(fig, columns, min_tariff, highlight_swing_states)
+        return fig
+    
+    regular_lons, regular_lats = lons[is_regular].tolist(), lats[is_regular].tolist()
+    regular_sizes, regular_tariff_rates = bubble_sizes[is_regular].tolist(), tariff_rates[is_regular].tolist()
+    regular_hover_texts, regular_country_names = hover_texts[is_regular].tolist(), country_names[is_regular].tolist()
+    
+    swing_lons, swing_lats = lons[is_swing_state].tolist(), lats[is_swing_state].tolist()
+    swing_sizes, swing_tariff_rates = bubble_sizes[is_swing_state].tolist(), tariff_rates[is_swing_state].tolist()
+    swing_hover_texts = hover_texts[is_swing_state].tolist()
+    
+    # Add regular bubbles (invisible if highlight_swing_states is enabled)
+    if not highlight_swing_states or len(regular_lons) > 0:  # Only add if not highlighting or if there are regular countries
+        fig.add_trace(go.Scattergeo(
+            lon=regular_lons,
+            lat=regular_lats,
+            mode='markers',
+            marker=dict(
+                size=regular_sizes,
+                color=regular_tariff_rates,  # Always use tariff rates for color
+                colorscale='Hot_r',  # Always use the reversed "Hot" colorscale
+                cmin=min_tariff,
+                cmax=50,
+                showscale=False,  # Don't show colorscale for regular bubbles
+                opacity=0 if highlight_swing_states else 0.7,  # Make invisible if highlighting swing states
+                line=dict(width=1, color='black')
+            ),
+            text=regular_country_names,
+            hoverinfo='text' if not highlight_swing_states else 'none',  # Disable hover info when invisible
+            hovertext=regular_hover_texts if not highlight_swing_states else None,
+            name='Regular Countries',
+            visible=True  # Keep trace in the figure even when invisible
+        ))
+    
+    # Add markers for geopolitical swing states (using hot colorscale like regular bubbles)
+    fig.add_trace(go.Scattergeo(
+        lon=swing_lons,
+        lat=swing_lats,
+        mode='markers',
+        marker=dict(
+            size=swing_sizes,
+            color=swing_tariff_rates,  # Use tariff rates for color mapping
+            colorscale='Hot_r',  # Use the reversed "Hot" colorscale
+            cmin=min_tariff,
+            cmax=50,
+            showscale=False,  # Don't show a second colorscale
+            opacity=0.7,
+            line=dict(width=1, color='black')
+        ),
+        text=swing_country_names,
+        hoverinfo='text',
+        hovertext=swing_hover_texts,
+        name='Geopolitical Swing States'
+    ))
+    
+    # Add a standalone colorscale that's always visible
+    fig.add_trace(go.Scatter(
+        x=[None],
+        y=[None],
+        mode='markers',
+        marker=dict(
+            colorscale='Hot_r',
+            showscale=True,
+            cmin=min_tariff,
+            cmax=50,
+            colorbar=dict(
+                title="Tariff Rate (%)",
+                thickness=15,
+                len=0.5,
+                y=0.5
+            )
+        ),
+        hoverinfo='none',
+        showlegend=False
+    ))
+    
+    return fig
+
+
+# Animated map of a tariff schedule (see tariff_map/timeline.py): one frame per effective
+# date, all computed in one pass, then played and scrubbed in the browser with the
+# controls under the map, without reruns. The tariff range filter does not apply, as the
+# rates change between frames. Everything but the bubble colors is shared by the frames,
+# and bubbles whose rate never changes get traces of their own that no frame touches, so
+# each frame only carries the colors of the bubbles that change at some date.
+def create_tariff_animation(data, schedule, min_imports, max_imports, selected_countries, highlight_swing_states=False, country_index=None, filter_index=None, frame_duration=800):
+    if country_index is None:
+        country_index, _ = build_country_index(data)
+    if filter_index is None:
+        filter_index = FilterIndex(data)
+    
+    # Matching rows with coordinates, so the rates line up with the bubble columns
+    rows = filter_index.rows(min_imports, max_imports, -np.inf, np.inf, selected_countries)
+    rows = rows[country_index.reindex(data['CTY_CODE'].take(rows).to_numpy())['lat'].notna().to_numpy()]
+    columns = bubble_columns(data, country_index, hover_text=False, rows=rows)
+    dates, rates = timeline_rates(data, schedule, rows)
+    if len(dates):
+        columns['tariff'] = rates[0]
+    changes = (rates != rates[:1]).any(axis=0)
+    
+    fig = go.Figure(layout=base_map_layout())
+    _add_country_shading(fig, columns, compact=True)
+    # One color scale for all frames
+    fig.layout.coloraxis = _compact_coloraxis(float(np.nanmin(rates)) if np.isfinite(rates).any() else 0.0)
+    
+    animated = []  # (trace position, bubbles)
+    for swing_state, name in _bubble_groups(highlight_swing_states):
+        group = columns['swing'] == swing_state
+        fig.add_trace(_compact_bubble_trace(columns, group & ~changes, swing_state, name))
+        if (group & changes).any():
+            fig.add_trace(_compact_bubble_trace(columns, group & changes, swing_state, name))
+            animated.append((len(fig.data) - 1, group & changes))
+    
+    labels = [date.strftime('%Y-%m-%d') for date in dates]
+    fig.frames = [
+        go.Frame(
+            name=label,
+            data=[go.Scattergeo(marker=dict(color=rates[step][bubbles])) for _, bubbles in animated],
+            traces=[position for position, _ in animated]
+        )
+        for step, label in enumerate(labels)
+    ]
+    if not labels:
+        return fig
+    
+    # Geo traces are redrawn on every frame (they have no animated transitions)
+    def animate(frames, duration):
+        return dict(
+            method='animate',
+            args=[frames, dict(mode='immediate', fromcurrent=True, frame=dict(duration=duration, redraw=True), transition=dict(duration=0))]
+        )
+    
+    fig.update_layout(
+        margin=dict(b=90),
+        updatemenus=[dict(
+            type='buttons',
+            direction='left',
+            showactive=False,
+            x=0,
+            y=0,
+            xanchor='left',
+            yanchor='top',
+            pad=dict(t=40, r=10),
+            buttons=[
+                dict(label="Play", **animate(None, frame_duration)),
+                dict(label="Pause", **animate([None], 0))
+            ]
+        )],
+        sliders=[dict(
+            active=0,
+            x=0.1,
+            len=0.9,
+            y=0,
+            yanchor='top',
+            currentvalue=dict(prefix="Effective date: "),
+            steps=[dict(label=label, **animate([label], 0)) for label in labels]
+        )]
+    )
+    return fig
+
+
+# Least-recently-used cache of complete figures keyed by the filter values that
+# produced them. Figures are shared between sessions and must not be modified.
+# Each entry records the version of the data it was built from (see tariff_map/dataset.py)
+# and is only returned for that version.
+class FigureCache:
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, version=None):
+        with self._lock:
+            entry = self._figures.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._figures.move_to_end(key)
+            return entry[1]
+    
+    def put(self, key, fig, version=None):
+        with self._lock:
+            self._figures[key] = (version, fig)
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_entries:
+                self._figures.popitem(last=False)
+    
+    # Carry the figures of old_version over to new_version when keep(key) is true and
+    # drop the others
+    def advance(self, old_version, new_version, keep):
+        with self._lock:
+            for key, (version, fig) in list(self._figures.items()):
+                if version != old_version:
+                    continue
+                if keep(key):
+                    self._figures[key] = (new_version, fig)
+                else:
+                    del self._figures[key]
+
+# Key of the rows selected by a set of filter values in the figure caches: data key,
+# import range, tariff range and sorted countries. With an index the ranges are widened
+# to the nearest data values outside them (FilterIndex.widest_range), so all slider
+# positions selecting the same rows share a key; figure_unaffected still applies, the
+# wider ranges only make it more cautious.
+def filter_key(data_key, min_imports, max_imports, min_tariff, max_tariff, selected_countries, filter_index=None):
+    if filter_index is not None:
+        min_imports, max_imports = filter_index.widest_range('imports', min_imports, max_imports)
+        min_tariff, max_tariff = filter_index.widest_range('tariffs', min_tariff, max_tariff)
+    return (data_key, min_imports, max_imports, min_tariff, max_tariff, tuple(sorted(selected_countries)))
+
+# Return the bubble map for a set of filter values, reusing a cached figure when
+# the same combination was rendered recently (by any session). The lower tariff bound
+# also sets the color scale, so it is part of the key as given.
+def cached_bubble_map(cache, data_key, data, min_imports, max_imports, min_tariff, max_tariff, selected_countries, highlight_swing_states=False, country_index=None, filter_index=None, compact=False, data_version=None):
+    key = filter_key(data_key, min_imports, max_imports, min_tariff, max_tariff, selected_countries, filter_index) + (min_tariff, highlight_swing_states, compact)
+    fig = cache.get(key, data_version)
+    if fig is None:
+        fig = create_bubble_map(data, min_imports, max_imports, min_tariff, max_tariff, selected_countries, highlight_swing_states, country_index, filter_index, compact)
+        cache.put(key, fig, data_version)
+    return fig
+
+# For a key starting with a filter_key, whether the figure is the same after the given rows changed
+# (dataset.changed_rows: old and new versions). A change matters when either version
+# of a row passes the key's filters: the row is shown before or after the update.
+def figure_unaffected(key, changed):
+    _, min_imports, max_imports, min_tariff, max_tariff, countries = key[:6]
+    imports = changed['Imports ($B)'].to_numpy(dtype=float)
+    tariffs = changed['Tariff Rate'].to_numpy(dtype=float)
+    shown = (imports >= min_imports) & (imports <= max_imports) & (tariffs >= min_tariff) & (tariffs <= max_tariff)
+    if countries:
+        shown &= changed['CTYNAME'].isin(countries).to_numpy()
+    return not shown.any()
@@ -0,0 +1,165 @@
+# Prebuilt index for the map filters.
+#
+# Import values and tariff rates are kept as row ids sorted by value, so a range is
+# found with two binary searches, and each country maps to its row ids. A query starts
+# from the smallest of those candidate sets and checks the remaining conditions on the
+# candidates only, so its cost follows the size of the result instead of the number
+# of rows, and no full-size masks or copies of the frame are made.
+import numpy as np
+import pandas as pd
+
+
+class FilterIndex:
+    def __init__(self, data):
+        self.num_rows = len(data)
+        self._imports = data['Imports ($B)'].to_numpy(dtype=float)
+        self._tariffs = data['Tariff Rate'].to_numpy(dtype=float)
+        self._import_order, self._sorted_imports = self._sorted_rows(self._imports)
+        self._tariff_order, self._sorted_tariffs = self._sorted_rows(self._tariffs)
+
+        self._country_rows = self._rows_by_country(data['CTYNAME'])
+
+    # Country name -> row ids (ascending)
+    @staticmethod
+    def _rows_by_country(names):
+        codes, uniques = pd.factorize(names)
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        starts = np.concatenate(([0], np.cumsum(counts)))
+        order = order[len(order) - starts[-1]:]  # rows without a name sort first; drop them
+        return {
+            name: order[starts[i]:starts[i + 1]] for i, name in enumerate(uniques)
+        }
+
+    # Row ids sorted by value, leaving out missing values (they never match a range)
+    @staticmethod
+    def _sorted_rows(values):
+        order = np.argsort(values, kind='stable')
+        order = order[~np.isnan(values[order])]
+        return order, values[order]
+
+    # Move the given rows to their new values in a sorted order without sorting again:
+    # drop them, then insert the ones with a value at their binary-searched positions
+    @staticmethod
+    def _resorted_rows(order, values, rows):
+        moved = np.zeros(len(values), dtype=bool)
+        moved[rows] = True
+        kept = order[~moved[order]]
+        rows = rows[~np.isnan(values[rows])]
+        rows = rows[np.argsort(values[rows], kind='stable')]
+        order = np.insert(kept, np.searchsorted(values[kept], values[rows], side='right'), rows)
+        return order, values[order]
+
+    # Index of data after the rows at the given positions changed (same number of rows,
+    # unchanged rows in the same positions). The index itself is not modified, so queries
+    # running against it are unaffected.
+    def updated(self, data, rows):
+        rows = np.unique(np.asarray(rows, dtype=np.intp))
+        index = FilterIndex.__new__(FilterIndex)
+        index.num_rows = self.num_rows
+        index._imports = data['Imports ($B)'].to_numpy(dtype=float)
+        index._tariffs = data['Tariff Rate'].to_numpy(dtype=float)
+        index._import_order, index._sorted_imports = self._resorted_rows(self._import_order, index._imports, rows)
+        index._tariff_order, index._sorted_tariffs = self._resorted_rows(self._tariff_order, index._tariffs, rows)
+
+        # The country lists only change when a changed row was renamed
+        names = data['CTYNAME']
+        renamed = any(
+            row not in self._country_rows.get(name, ()) for row, name in zip(rows, names.take(rows))
+        )
+        index._country_rows = self._rows_by_country(names) if renamed else self._country_rows
+        return index
+
+    @staticmethod
+    def _range(order, sorted_values, low, high):
+        start = np.searchsorted(sorted_values, low, side='left')
+        stop = np.searchsorted(sorted_values, high, side='right')
+        return order[start:stop]
+
+    def _sorted_values(self, column):
+        return self._sorted_imports if column == 'imports' else self._sorted_tariffs
+
+    # Widest range selecting the same import values (column 'imports') or tariff rates
+    # ('tariffs') as [low, high]: the nearest values outside it, or -inf / inf. All ranges
+    # between the same two values select the same rows.
+    def widest_range(self, column, low, high):
+        values = self._sorted_values(column)
+        start = np.searchsorted(values, low, side='left')
+        stop = np.searchsorted(values, high, side='right')
+        return (
+            float(values[start - 1]) if start > 0 else -np.inf,
+            float(values[stop]) if stop < len(values) else np.inf
+        )
+
+    # Ranges one value away from [low, high], as the nearest slider positions that change
+    # the selection: (low moved down to include the next value, low moved up past the
+    # lowest included value, high moved down past the highest included value, high moved
+    # up to include the next value), None where there is no such value (or, for the
+    # middle two, when no value is included)
+    def range_steps(self, column, low, high):
+        values = self._sorted_values(column)
+        start = np.searchsorted(values, low, side='left')
+        stop = np.searchsorted(values, high, side='right')
+
+        def value(position):
+            return float(values[position]) if 0 <= position < len(values) else None
+
+        return (
+            value(start - 1),
+            value(np.searchsorted(values, values[start], side='right')) if start < stop else None,
+            value(np.searchsorted(values, values[stop - 1], side='left') - 1) if start < stop else None,
+            value(stop)
+        )
+
+    # Positions (ascending) of the rows within both ranges and, if any are given,
+    # belonging to one of the selected countries
+    def rows(self, min_imports, max_imports, min_tariff, max_tariff, selected_countries=()):
+        candidates = [
+            self._range(self._import_order, self._sorted_imports, min_imports, max_imports),
+            self._range(self._tariff_order, self._sorted_tariffs, min_tariff, max_tariff)
+        ]
+        if selected_countries:
+            country_rows = [self._country_rows[name] for name in set(selected_countries) if name in self._country_rows]
+            candidates.append(np.concatenate(country_rows) if country_rows else np.empty(0, dtype=np.intp))
+
+        smallest = min(range(len(candidates)), key=lambda i: len(candidates[i]))
+        rows = candidates[smallest]
+        if smallest != 0:
+            imports = self._imports[rows]
+            rows = rows[(imports >= min_imports) & (imports <= max_imports)]
+        if smallest != 1:
+            tariffs = self._tariffs[rows]
+            rows = rows[(tariffs >= min_tariff) & (tariffs <= max_tariff)]
+        if selected_countries and smallest != 2:
+            rows = rows[np.isin(rows, candidates[2])]
+        return np.sort(rows)
+
+
+# Rows of data matching the map filters
+def filter_data(data, min_imports, max_imports, min_tariff, max_tariff, selected_countries, filter_index=None):
+    if filter_index is not None:
+        # Look up the matching rows in the prebuilt index and take only those
+        return data.take(filter_index.rows(min_imports, max_imports, min_tariff, max_tariff, selected_countries))
+
+    # Filter by import value and tariff rate range
+    filtered_df = data[
+        (data['Imports ($B)'] >= min_imports) &
+        (data['Imports ($B)'] <= max_imports) &
+        (data['Tariff Rate'] >= min_tariff) &
+        (data['Tariff Rate'] <= max_tariff)
+    ]
+
+    # Filter by countries if any are selected
+    if selected_countries:
+        filtered_df = filtered_df[filtered_df['CTYNAME'].isin(selected_countries)]
+    return filtered_df
+
+
+# Values offered by the sidebar filters for a dataset: country names and the bounds of
+# the import and tariff sliders
+def filter_options(data):
+    return {
+        'countries': sorted(data['CTYNAME'].dropna().unique()),
+        'imports': (float(data['Imports ($B)'].min()), float(data['Imports ($B)'].max())),
+        'tariffs': (float(data['Tariff Rate'].min()), float(data['Tariff Rate'].max()))
+    }
@@ -0,0 +1,246 @@
+# Per-rerun instrumentation of the app's hot path.
+#
+# Each script rerun gets a RerunMetrics recorder (see start_rerun) that collects the wall
+# time of named stages, optionally the memory allocated in them, and the byte size of the
+# payloads sent to the browser. Stages can be opened anywhere with `with stage('name')`;
+# they attach to the recorder of the current thread (Streamlit runs each session's
+# script in its own thread) and are a no-op outside a rerun.
+#
+# Finished reruns can be exported by a process-wide MetricsExporter as JSON lines and/or
+# a Prometheus textfile (node_exporter textfile collector format). Allocation tracing uses
+# tracemalloc, which slows Python down noticeably; it is only started when the
+# TARIFF_MAP_TRACE_ALLOCATIONS environment variable is set. tracemalloc is process-wide, so
+# with concurrent sessions the allocation figures include other sessions' allocations.
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+
+JSONL_PATH_ENV = 'TARIFF_MAP_METRICS_JSONL'
+PROMETHEUS_PATH_ENV = 'TARIFF_MAP_METRICS_PROM'
+TRACE_ALLOCATIONS_ENV = 'TARIFF_MAP_TRACE_ALLOCATIONS'
+
+# Histogram buckets (seconds) for rerun and stage latencies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Sessions without a rerun for this long are dropped from the Prometheus output
+SESSION_EXPIRY_SECONDS = 15 * 60
+
+_active = threading.local()
+
+# id(figure) -> JSON size of the figures measured so far (see figure_payload_bytes)
+_figure_sizes = {}
+_figure_sizes_lock = threading.Lock()
+
+
+class RerunMetrics:
+    def __init__(self, session_id, trace_allocations=False):
+        self.session_id = session_id
+        self.started_at = time.time()
+        self.trace_allocations = trace_allocations and tracemalloc.is_tracing()
+        self.stages = []
+        self.payloads = {}
+        self.total_seconds = None
+        self._start = time.perf_counter()
+        self._open_stages = []
+
+    # Time a named stage; nested stages are recorded as "outer/inner"
+    @contextmanager
+    def stage(self, name):
+        full_name = '/'.join(self._open_stages + [name])
+        top_level = not self._open_stages
+        self._open_stages.append(name)
+        if self.trace_allocations:
+            if top_level:
+                tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = {'stage': full_name, 'seconds': time.perf_counter() - start}
+            if self.trace_allocations:
+                memory_after, peak = tracemalloc.get_traced_memory()
+                entry['allocated_bytes'] = memory_after - memory_before
+                if top_level:
+                    entry['peak_bytes'] = max(peak - memory_before, 0)
+            self.stages.append(entry)
+            self._open_stages.pop()
+
+    def record_payload(self, name, num_bytes):
+        self.payloads[name] = int(num_bytes)
+
+    def finish(self):
+        if self.total_seconds is None:
+            self.total_seconds = time.perf_counter() - self._start
+        return self
+
+    def to_record(self):
+        return {
+            'session_id': self.session_id,
+            'started_at': self.started_at,
+            'total_seconds': self.total_seconds,
+            'stages': self.stages,
+            'payloads': self.payloads
+        }
+
+
+# Start recording a rerun on the current thread
+def start_rerun(session_id):
+    if os.environ.get(TRACE_ALLOCATIONS_ENV) and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    metrics = RerunMetrics(session_id, trace_allocations=bool(os.environ.get(TRACE_ALLOCATIONS_ENV)))
+    _active.metrics = metrics
+    return metrics
+
+
+# Recorder of the rerun running on this thread, if any
+def current_metrics():
+    return getattr(_active, 'metrics', None)
+
+
+@contextmanager
+def stage(name):
+    metrics = current_metrics()
+    if metrics is None:
+        yield
+    else:
+        with metrics.stage(name):
+            yield
+
+
+def record_payload(name, num_bytes):
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.record_payload(name, num_bytes)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def lines(self, name, labels):
+        label_text = ''.join(f'{key}="{value}",' for key, value in labels.items())
+        lines = [f'{name}_bucket{{{label_text}le="{bound}"}} {count}' for bound, count in zip(self.buckets, self.counts)]
+        lines.append(f'{name}_bucket{{{label_text}le="+Inf"}} {self.count}')
+        plain = '{' + label_text.rstrip(',') + '}' if labels else ''
+        lines.append(f'{name}_sum{plain} {self.sum}')
+        lines.append(f'{name}_count{plain} {self.count}')
+        return lines
+
+
+# Process-wide sink for finished reruns. Appends one JSON line per rerun and rewrites
+# the Prometheus textfile with cumulative histograms (per session for rerun latency,
+# per stage for stage latency) and the last payload sizes.
+class MetricsExporter:
+    def __init__(self, jsonl_path=None, prometheus_path=None, buckets=LATENCY_BUCKETS):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._rerun_latency = {}
+        self._session_seen = {}
+        self._stage_latency = {}
+        self._payload_bytes = {}
+
+    @classmethod
+    def from_environment(cls):
+        return cls(os.environ.get(JSONL_PATH_ENV), os.environ.get(PROMETHEUS_PATH_ENV))
+
+    @property
+    def enabled(self):
+        return bool(self.jsonl_path or self.prometheus_path)
+
+    def export(self, metrics):
+        record = metrics.to_record()
+        with self._lock:
+            if self.jsonl_path:
+                with open(self.jsonl_path, 'a') as f:
+                    f.write(json.dumps(record) + '\n')
+            if self.prometheus_path:
+                self._observe(record)
+                self._write_prometheus()
+
+    def _observe(self, record):
+        session = record['session_id']
+        self._session_seen[session] = time.time()
+        self._rerun_latency.setdefault(session, _Histogram(self.buckets)).observe(record['total_seconds'])
+        for entry in record['stages']:
+            self._stage_latency.setdefault(entry['stage'], _Histogram(self.buckets)).observe(entry['seconds'])
+        self._payload_bytes.update(record['payloads'])
+
+        expired = [s for s, seen in self._session_seen.items() if time.time() - seen > SESSION_EXPIRY_SECONDS]
+        for session in expired:
+            del self._session_seen[session]
+            del self._rerun_latency[session]
+
+    def _write_prometheus(self):
+        lines = [
+            '# HELP tariff_map_rerun_seconds Wall time of a full script rerun.',
+            '# TYPE tariff_map_rerun_seconds histogram'
+        ]
+        for session, histogram in sorted(self._rerun_latency.items()):
+            lines += histogram.lines('tariff_map_rerun_seconds', {'session': session})
+        lines += [
+            '# HELP tariff_map_stage_seconds Wall time of one stage of a rerun.',
+            '# TYPE tariff_map_stage_seconds histogram'
+        ]
+        for stage_name, histogram in sorted(self._stage_latency.items()):
+            lines += histogram.lines('tariff_map_stage_seconds', {'stage': stage_name})
+        lines += [
+            '# HELP tariff_map_payload_bytes Size of the last payload of each kind sent to the browser.',
+            '# TYPE tariff_map_payload_bytes gauge'
+        ]
+        for payload, num_bytes in sorted(self._payload_bytes.items()):
+            lines.append(f'tariff_map_payload_bytes{{payload="{payload}"}} {num_bytes}')
+
+        # Write next to the target and rename so the collector never reads a partial file
+        temporary = self.prometheus_path + '.tmp'
+        with open(temporary, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(temporary, self.prometheus_path)
+
+
+# Size of a DataFrame once serialized to an Arrow IPC stream, as st.dataframe sends it
+def dataframe_payload_bytes(df):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+
+# Size of a plotly figure's JSON, as st.plotly_chart sends it. Cached figures are shared
+# and never modified, so the size is computed once per figure object and reused on every
+# cache hit; it is forgotten when the figure is garbage collected.
+def figure_payload_bytes(fig):
+    key = id(fig)
+    with _figure_sizes_lock:
+        size = _figure_sizes.get(key)
+    if size is None:
+        size = len(fig.to_json().encode())
+        with _figure_sizes_lock:
+            if key not in _figure_sizes:
+                _figure_sizes[key] = size
+                weakref.finalize(fig, _forget_figure_size, key)
+    return size
+
+
+def _forget_figure_size(key):
+    with _figure_sizes_lock:
+        _figure_sizes.pop(key, None)
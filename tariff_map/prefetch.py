@@ -0,0 +1,99 @@
+# Background precomputation of the filter states a session is likely to ask for next.
+#
+# After a rerun draws the map, the app lists the states one interaction away from the
+# current one (neighbor_states): either end of the import and tariff sliders moved to
+# the next position that changes the selected rows, and the swing-state highlight
+# toggled. A Prefetcher builds their maps into the shared figure cache in one worker
+# thread while the user looks at the page, so the next rerun finds its map there.
+#
+# Each rerun replaces the session's pending work and a new rerun drops it, and the work
+# only starts once the session has been idle for a short delay, so stale states are
+# never built and prefetching does not compete with the reruns of a slider drag. With
+# several sessions the worker takes one task from each in turn.
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+DEFAULT_PREFETCH_DELAY = 0.3  # seconds
+
+logger = logging.getLogger(__name__)
+
+
+# Filter states (min_imports, max_imports, min_tariff, max_tariff, countries, highlight)
+# one interaction away from the given one, most likely first. Import ranges and the upper
+# tariff bound move to the nearest values that change the rows (FilterIndex.range_steps);
+# the lower tariff bound also sets the map's color scale, so it moves by the tariff
+# slider's step within tariff_bounds.
+def neighbor_states(filter_index, import_range, tariff_range, selected_countries, highlight_swing_states, tariff_bounds, tariff_step=1.0):
+    min_imports, max_imports = import_range
+    min_tariff, max_tariff = tariff_range
+    countries = tuple(selected_countries)
+    states = [(min_imports, max_imports, min_tariff, max_tariff, countries, not highlight_swing_states)]
+
+    low_down, low_up, high_down, high_up = filter_index.range_steps('imports', min_imports, max_imports)
+    for low, high in [(low_down, max_imports), (low_up, max_imports), (min_imports, high_down), (min_imports, high_up)]:
+        if low is not None and high is not None and low <= high:
+            states.append((low, high, min_tariff, max_tariff, countries, highlight_swing_states))
+
+    _, _, high_down, high_up = filter_index.range_steps('tariffs', min_tariff, max_tariff)
+    lows = [max(min_tariff - tariff_step, tariff_bounds[0]), min(min_tariff + tariff_step, tariff_bounds[1])]
+    for low, high in [(low, max_tariff) for low in lows if low != min_tariff] + [(min_tariff, high_down), (min_tariff, high_up)]:
+        if high is not None and low <= high:
+            states.append((min_imports, max_imports, low, high, countries, highlight_swing_states))
+    return states
+
+
+class Prefetcher:
+    def __init__(self, delay=DEFAULT_PREFETCH_DELAY):
+        self.delay = delay
+        self._pending = OrderedDict()  # session id -> (start time, deque of tasks), in turn order
+        self._condition = threading.Condition()
+        self._thread = None
+
+    # Replace the session's pending tasks (callables without arguments) with the given
+    # ones, to be started after the delay
+    def request(self, session_id, tasks):
+        with self._condition:
+            self._pending.pop(session_id, None)
+            if tasks:
+                self._pending[session_id] = (time.monotonic() + self.delay, deque(tasks))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name='tariff-map-prefetch', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    # Drop the session's pending tasks (a task already running is finished)
+    def cancel(self, session_id):
+        with self._condition:
+            self._pending.pop(session_id, None)
+
+    def pending(self, session_id=None):
+        with self._condition:
+            if session_id is not None:
+                return len(self._pending[session_id][1]) if session_id in self._pending else 0
+            return sum(len(tasks) for _, tasks in self._pending.values())
+
+    # Next task whose delay has passed, taking sessions in turn
+    def _next_task(self):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                ready = next((session_id for session_id, (start, _) in self._pending.items() if start <= now), None)
+                if ready is not None:
+                    break
+                starts = [start for start, _ in self._pending.values()]
+                self._condition.wait(min(starts) - now if starts else None)
+            start, tasks = self._pending.pop(ready)
+            task = tasks.popleft()
+            if tasks:
+                self._pending[ready] = (start, tasks)
+            return task
+
+    def _work(self):
+        while True:
+            task = self._next_task()
+            try:
+                task()
+            except Exception:  # a failed guess only costs the cache hit
+                logger.exception("Prefetching a figure failed")
@@ -0,0 +1,128 @@
+# Product-level (HS code) import data.
+#
+# Census product files have one row per country, HS commodity code and month, which
+# runs to millions of rows. They are streamed in chunks and aggregated into a small
+# cube of imports per (year, country, HS product), written once with:
+#
+#     python -m tariff_map.product_data imports_hs10_2024.csv --year 2024
+#
+# The map then filters the cube by HS chapter and sums it back to the one-row-per-country
+# frame create_bubble_map expects, without rereading the raw file.
+import argparse
+import os
+
+import pandas as pd
+
+PRODUCT_CUBE_PATH = 'product_cube.parquet'
+
+# Column names in the Census international trade API / USA Trade Online exports
+CTY_CODE_COLUMN = 'CTY_CODE'
+CTY_NAME_COLUMN = 'CTY_NAME'
+COMMODITY_COLUMN = 'I_COMMODITY'
+VALUE_COLUMN = 'GEN_VAL_MO'
+YEAR_COLUMN = 'YEAR'
+
+
+# Stream a product-level CSV and aggregate imports per (year, CTY_CODE, HS product).
+# Only one chunk plus the running aggregate is held in memory at a time; the aggregate
+# is bounded by the number of distinct (country, product) pairs, not by the file size.
+def aggregate_product_csv(path, year=None, hs_digits=6, chunksize=500_000,
+                          cty_code_column=CTY_CODE_COLUMN, cty_name_column=CTY_NAME_COLUMN,
+                          commodity_column=COMMODITY_COLUMN, value_column=VALUE_COLUMN,
+                          year_column=YEAR_COLUMN):
+    header = pd.read_csv(path, nrows=0).columns
+    has_year = year_column in header
+    if not has_year and year is None:
+        raise ValueError(f"{path} has no {year_column} column; pass the year explicitly")
+
+    usecols = [cty_code_column, cty_name_column, commodity_column, value_column] + ([year_column] if has_year else [])
+    reader = pd.read_csv(
+        path,
+        usecols=usecols,
+        dtype={commodity_column: str, cty_code_column: str, cty_name_column: str},
+        chunksize=chunksize
+    )
+
+    keys = ['year', 'CTY_CODE', 'HS']
+    partials, partial_rows = [], 0
+    names = {}
+    for chunk in reader:
+        # Census files include total and grouping rows ("-" commodity, "1XXX" country groups)
+        chunk = chunk[
+            chunk[commodity_column].str.fullmatch(r'\d+', na=False) &
+            (chunk[commodity_column].str.len() >= hs_digits) &
+            chunk[cty_code_column].str.fullmatch(r'\d+', na=False)
+        ]
+        codes = chunk[cty_code_column].astype('int64')
+
+        values = pd.to_numeric(chunk[value_column], errors='coerce').fillna(0)
+        partial = pd.DataFrame({
+            'year': chunk[year_column].astype('int64') if has_year else int(year),
+            'CTY_CODE': codes,
+            'HS': chunk[commodity_column].str[:hs_digits],
+            'value': values
+        }).groupby(keys, sort=False, observed=True)['value'].sum()
+        partials.append(partial)
+        partial_rows += len(partial)
+
+        first_rows = ~codes.duplicated()
+        for code, name in zip(codes[first_rows], chunk.loc[first_rows, cty_name_column]):
+            names.setdefault(code, name)
+
+        # Fold the partial aggregates together before they grow past a few chunks' worth
+        if partial_rows > 4 * chunksize:
+            partials = [pd.concat(partials).groupby(level=keys, sort=False).sum()]
+            partial_rows = len(partials[0])
+
+    if partials:
+        totals = pd.concat(partials).groupby(level=keys).sum()
+    else:
+        totals = pd.Series(dtype=float, index=pd.MultiIndex.from_arrays([[], [], []], names=keys))
+
+    cube = totals.rename('Imports ($B)').reset_index()
+    cube['Imports ($B)'] = cube['Imports ($B)'] / 1e9
+    cube['CTYNAME'] = cube['CTY_CODE'].map(names)
+    cube['HS_CHAPTER'] = cube['HS'].str[:2].astype('category')
+    return cube[['year', 'CTY_CODE', 'CTYNAME', 'HS', 'HS_CHAPTER', 'Imports ($B)']]
+
+
+def save_product_cube(cube, path=PRODUCT_CUBE_PATH):
+    cube.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+
+
+def load_product_cube(path=PRODUCT_CUBE_PATH):
+    return pd.read_parquet(path, memory_map=True)
+
+
+# HS chapters (2-digit codes) present in the cube, sorted
+def hs_chapters(cube):
+    return sorted(cube['HS_CHAPTER'].astype(str).unique())
+
+
+# Per-country frame for the selected HS chapters: the base frame (tariff rate, exports,
+# swing-state flag) with 'Imports ($B)' replaced by the imports in those chapters.
+# Countries without imports in the selected chapters are left out.
+def country_view(cube, base, chapters):
+    selected = cube[cube['HS_CHAPTER'].isin(list(chapters))]
+    imports = selected.groupby(['year', 'CTY_CODE'], observed=True)['Imports ($B)'].sum()
+    view = base.drop(columns=['Imports ($B)']).join(imports, on=['year', 'CTY_CODE'], how='inner')
+    return view[list(base.columns)].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate a product-level (HS) import CSV into the product cube.")
+    parser.add_argument('csv_path', help="Census product-level import CSV")
+    parser.add_argument('--year', type=int, help=f"Year of the data, if the file has no {YEAR_COLUMN} column")
+    parser.add_argument('--hs-digits', type=int, default=6, help="HS code length kept in the cube (default: 6)")
+    parser.add_argument('--chunksize', type=int, default=500_000, help="Rows read per chunk (default: 500000)")
+    parser.add_argument('--out', default=PRODUCT_CUBE_PATH, help=f"Output Parquet file (default: {PRODUCT_CUBE_PATH})")
+    args = parser.parse_args()
+
+    cube = aggregate_product_csv(args.csv_path, year=args.year, hs_digits=args.hs_digits, chunksize=args.chunksize)
+    save_product_cube(cube, args.out)
+    print(f"{len(cube)} (year, country, product) rows, {cube['HS_CHAPTER'].nunique()} chapters -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+# Tariff scenario engine.
+#
+# A scenario is a tariff schedule: one rate (%) per country. Scenarios are evaluated in
+# batches as (scenarios x countries) NumPy matrices, so thousands of what-ifs cost about
+# as much as a few matrix products. Imports are held at their observed level, so the
+# implied duty of a country is simply rate / 100 * imports.
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+# Upper bound on the worker processes of one run, so one request cannot take every core
+MAX_WORKERS = 4
+
+
+# Per-country inputs of the engine, in the row order of the frame. Rows without an
+# import value or tariff rate (e.g. unparseable in the CSV) are left out, as a single
+# missing value would turn every total into NaN; a missing export value counts as 0.
+def country_arrays(data):
+    known = (data['Imports ($B)'].notna() & data['Tariff Rate'].notna()).to_numpy()
+    return {
+        'CTY_CODE': data['CTY_CODE'].to_numpy()[known],
+        'imports': data['Imports ($B)'].to_numpy(dtype=float)[known],
+        'exports': np.nan_to_num(data['Exports ($B)'].to_numpy(dtype=float)[known]),
+        'rates': data['Tariff Rate'].to_numpy(dtype=float)[known],
+        'swing': data['Geopolitical_swing_state'].to_numpy(dtype=bool)[known]
+    }
+
+
+# One uniform rate for every country per scenario -> (len(rates), num_countries)
+def uniform_rates(rates, num_countries):
+    return np.repeat(np.asarray(rates, dtype=float)[:, None], num_countries, axis=1)
+
+
+# Start every scenario from the base schedule and apply its per-country overrides.
+# overrides is a list (one entry per scenario) of {CTY_CODE: rate} dicts.
+def override_rates(base_rates, cty_codes, overrides):
+    rates = np.repeat(np.asarray(base_rates, dtype=float)[None, :], len(overrides), axis=0)
+    column = {code: i for i, code in enumerate(cty_codes)}
+    for scenario, changes in enumerate(overrides):
+        for code, rate in changes.items():
+            rates[scenario, column[code]] = rate
+    return rates
+
+
+# Liberation Day style schedule: half the trade deficit as a share of imports, with a
+# floor. discount and floor may be arrays to produce one scenario per value. Missing
+# imports or exports count as 0 instead of making the rate NaN.
+def deficit_rates(imports, exports, discount=0.5, floor=10.0):
+    imports = np.nan_to_num(np.asarray(imports, dtype=float))
+    exports = np.nan_to_num(np.asarray(exports, dtype=float))
+    discount = np.atleast_1d(np.asarray(discount, dtype=float))[:, None]
+    floor = np.atleast_1d(np.asarray(floor, dtype=float))[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        deficit_share = np.where(imports > 0, (imports - exports) / imports, 0.0)
+    return np.maximum(floor, 100 * deficit_share[None, :] * discount)
+
+
+# Random perturbations of a base schedule: each rate is scaled by a lognormal factor
+# with the given volatility, then clipped to [0, cap]
+def random_rates(base_rates, num_scenarios, volatility=0.25, cap=200.0, rng=None):
+    rng = np.random.default_rng(rng)
+    base_rates = np.asarray(base_rates, dtype=float)
+    factors = rng.lognormal(mean=0.0, sigma=volatility, size=(num_scenarios, len(base_rates)))
+    return np.clip(base_rates[None, :] * factors, 0.0, cap)
+
+
+# Evaluate a (scenarios x countries) rate matrix. Returns per-scenario totals in $B and,
+# when keep_duties is set, the full duty matrix.
+def evaluate(rates, imports, swing, keep_duties=False):
+    imports = np.nan_to_num(np.asarray(imports, dtype=float))
+    duties = np.asarray(rates, dtype=float) / 100 * imports[None, :]
+    total = duties.sum(axis=1)
+    swing_duties = duties[:, swing].sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        swing_share = np.where(total > 0, swing_duties / total, 0.0)
+    results = {
+        'total_duties': total,
+        'swing_duties': swing_duties,
+        'swing_share': swing_share,
+        'average_rate': 100 * total / imports.sum() if imports.sum() > 0 else np.zeros_like(total)
+    }
+    if keep_duties:
+        results['duties'] = duties
+    return results
+
+
+# Percentiles (and mean) of every per-scenario metric
+def summarize(results, percentiles=DEFAULT_PERCENTILES):
+    summary = {}
+    for name, values in results.items():
+        if name == 'duties':
+            continue
+        summary[name] = {'mean': float(np.mean(values))}
+        summary[name].update({f'p{p}': float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))})
+    return summary
+
+
+def _monte_carlo_batch(base_rates, imports, swing, num_scenarios, volatility, cap, seed):
+    rates = random_rates(base_rates, num_scenarios, volatility, cap, np.random.default_rng(seed))
+    return evaluate(rates, imports, swing)
+
+
+# Start method of the process pool. Forking a multithreaded process (e.g. the Streamlit
+# server) can deadlock the child on a lock held by another thread, so workers are started
+# from a fork server (or spawned where there is none) instead.
+def _pool_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+# Monte Carlo over random perturbations of the frame's tariff schedule. Scenarios are
+# generated and evaluated in batches of batch_size (bounding memory to one
+# batch_size x countries matrix per worker); with workers > 1 the batches run in a
+# process pool of at most MAX_WORKERS processes. Returns the concatenated per-scenario
+# metrics.
+def run_monte_carlo(data, num_scenarios, volatility=0.25, cap=200.0, seed=None, batch_size=10_000, workers=1):
+    arrays = country_arrays(data)
+    sizes = [min(batch_size, num_scenarios - start) for start in range(0, num_scenarios, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [
+        (arrays['rates'], arrays['imports'], arrays['swing'], size, volatility, cap, batch_seed)
+        for size, batch_seed in zip(sizes, seeds)
+    ]
+
+    workers = min(workers, MAX_WORKERS, len(args))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+            batches = list(pool.map(_monte_carlo_batch, *zip(*args)))
+    else:
+        batches = [_monte_carlo_batch(*batch_args) for batch_args in args]
+
+    if not batches:
+        return evaluate(np.empty((0, len(arrays['rates']))), arrays['imports'], arrays['swing'])
+    return {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
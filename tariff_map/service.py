@@ -0,0 +1,297 @@
+# HTTP query service over the import data, for tools that need the map's filtered rows
+# or figures without running Streamlit.
+#
+#     python -m tariff_map.service --port 8600
+#
+#     GET /options?year=2024
+#     GET /rows?min_imports=1&max_imports=50&min_tariff=20&max_tariff=50&country=China&country=Mexico
+#     GET /figure?min_tariff=20&highlight=1            (compact figure JSON; compact=0 for the full one)
+#
+# Parameters match the app's filters: import range (Billion USD), tariff range (%),
+# repeated country= values (none = all), highlight (swing states) and, when the data
+# store holds several years, repeated year= values (none = all). Missing range bounds
+# default to the bounds of the data.
+#
+# Each dataset is loaded once and shared read-only by all request threads, and reloaded
+# when its source files change (see tariff_map/dataset.py). Datasets load outside the
+# service lock, so loading one year selection does not hold up requests for others, and
+# only the max_datasets most recently used selections are kept (the others stop being
+# watched and are loaded again when asked for). Responses are cached by data
+# version, endpoint and normalized parameters, so equivalent queries ("1" and "1.0",
+# countries in any order) share an entry, and carry an ETag derived from the body: a
+# request whose If-None-Match matches gets an empty 304 response, also after a reload
+# that did not change its result.
+import argparse
+import hashlib
+import json
+import logging
+import math
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from .data_store import DEFAULT_CSV, STORE_DIR, import_data_paths, list_store_years, load_import_data
+from .dataset import LiveDataset, reload_interval_from_environment
+
+ENDPOINTS = ('options', 'rows', 'figure')
+
+logger = logging.getLogger(__name__)
+
+
+# A query that cannot be answered; sent back as a JSON error with the given status
+class QueryError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# Least-recently-used cache of encoded responses: key -> (body, etag)
+class ResponseCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            response = self._responses.get(key)
+            if response is not None:
+                self._responses.move_to_end(key)
+            return response
+
+    def put(self, key, body):
+        response = (body, '"' + hashlib.sha1(body).hexdigest() + '"')
+        with self._lock:
+            self._responses[key] = response
+            self._responses.move_to_end(key)
+            while len(self._responses) > self.max_entries:
+                self._responses.popitem(last=False)
+        return response
+
+
+class QueryService:
+    def __init__(self, store_dir=STORE_DIR, csv_path=DEFAULT_CSV, cache_entries=256, reload_interval=0, max_datasets=8):
+        self.store_dir = store_dir
+        self.csv_path = csv_path
+        self.reload_interval = reload_interval
+        self.max_datasets = max_datasets
+        self.cache = ResponseCache(cache_entries)
+        self._datasets = OrderedDict()  # years -> LiveDataset, least recently used first
+        self._loading = {}  # years -> lock held while that dataset loads
+        self._lock = threading.Lock()
+
+    # Current Dataset for a tuple of years (empty = all, or the CSV when there is no store)
+    def dataset(self, years=()):
+        with self._lock:
+            live = self._datasets.get(years)
+            if live is not None:
+                self._datasets.move_to_end(years)
+                return live.current
+            loading = self._loading.setdefault(years, threading.Lock())
+
+        # Requests for the same years wait for one load; the others go on meanwhile
+        with loading:
+            with self._lock:
+                live = self._datasets.get(years)
+            if live is None:
+                try:
+                    live = self._load(years)
+                except BaseException:
+                    with self._lock:
+                        self._loading.pop(years, None)
+                    raise
+                # Stored and unmarked as loading at once, so no request finds neither
+                # and loads the same years again
+                with self._lock:
+                    self._datasets[years] = live
+                    self._loading.pop(years, None)
+                    evicted = []
+                    while len(self._datasets) > self.max_datasets:
+                        evicted.append(self._datasets.popitem(last=False)[1])
+                for old in evicted:
+                    old.stop()
+        return live.current
+
+    def _load(self, years):
+        if years and not list_store_years(self.store_dir):
+            raise QueryError("year= needs the data store (python -m tariff_map.data_store)")
+        try:
+            live = LiveDataset(
+                lambda: load_import_data(years, self.store_dir, self.csv_path),
+                lambda: import_data_paths(years, self.store_dir, self.csv_path)
+            )
+        except FileNotFoundError as error:
+            raise QueryError(str(error), status=404)
+        live.start(self.reload_interval)
+        return live
+
+    # Encoded response (body, etag) for an endpoint and its raw query parameters
+    def respond(self, endpoint, params):
+        years = tuple(sorted({_parse_int(value, 'year') for value in params.get('year', [])}))
+        dataset = self.dataset(years)
+        query = _normalize_query(params, dataset.options) if endpoint != 'options' else {}
+        key = (endpoint, dataset.version) + tuple(sorted(query.items()))
+
+        response = self.cache.get(key)
+        if response is None:
+            response = self.cache.put(key, self._render(endpoint, dataset, query).encode())
+        return response
+
+    def _render(self, endpoint, dataset, query):
+        if endpoint == 'options':
+            return json.dumps({**dataset.options, 'unresolved_countries': dataset.unresolved})
+
+        if endpoint == 'rows':
+            rows = dataset.filter_index.rows(
+                query['min_imports'], query['max_imports'], query['min_tariff'], query['max_tariff'], query['countries']
+            )
+            records = _decimal_floats(dataset.data.take(rows)).to_json(orient='records')
+            return '{"count": %d, "rows": %s}' % (len(rows), records)
+
+        from .figure import create_bubble_map
+
+        fig = create_bubble_map(
+            dataset.data, query['min_imports'], query['max_imports'], query['min_tariff'], query['max_tariff'],
+            list(query['countries']), query['highlight'], dataset.country_index, dataset.filter_index, query['compact']
+        )
+        return fig.to_json()
+
+
+# float32 columns as float64 holding the shortest decimal of each float32 value (e.g.
+# 136.56116 rather than 136.5611572265625), so the JSON shows only the digits stored
+def _decimal_floats(data):
+    columns = {
+        name: column.to_numpy().astype(str).astype(float)
+        for name, column in data.items() if column.dtype == np.float32
+    }
+    return data.assign(**columns) if columns else data
+
+
+def _parse_int(value, name):
+    try:
+        return int(value)
+    except ValueError:
+        raise QueryError(f"{name} must be an integer, got {value!r}")
+
+
+def _parse_float(params, name, default):
+    if name not in params:
+        return default
+    try:
+        value = float(params[name][-1])
+    except ValueError:
+        raise QueryError(f"{name} must be a number, got {params[name][-1]!r}")
+    if not math.isfinite(value):
+        raise QueryError(f"{name} must be finite")
+    return value
+
+
+def _parse_flag(params, name, default):
+    if name not in params:
+        return default
+    value = params[name][-1].lower()
+    if value not in ('0', '1', 'true', 'false'):
+        raise QueryError(f"{name} must be 0/1 or true/false, got {params[name][-1]!r}")
+    return value in ('1', 'true')
+
+
+# Filter values of a query with defaults filled in, in a canonical form for cache keys
+def _normalize_query(params, options):
+    min_imports, max_imports = options['imports']
+    min_tariff, max_tariff = options['tariffs']
+    return {
+        'min_imports': _parse_float(params, 'min_imports', min_imports),
+        'max_imports': _parse_float(params, 'max_imports', max_imports),
+        'min_tariff': _parse_float(params, 'min_tariff', min_tariff),
+        'max_tariff': _parse_float(params, 'max_tariff', max_tariff),
+        'countries': tuple(sorted(set(params.get('country', [])))),
+        'highlight': _parse_flag(params, 'highlight', False),
+        'compact': _parse_flag(params, 'compact', True)
+    }
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    # Set on the subclass created by make_server
+    service = None
+    quiet = False
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        endpoint = url.path.strip('/')
+        if endpoint not in ENDPOINTS:
+            self._send_error(404, f"Unknown endpoint {url.path!r}; use one of " + ", ".join('/' + name for name in ENDPOINTS))
+            return
+        try:
+            body, etag = self.service.respond(endpoint, parse_qs(url.query))
+        except QueryError as error:
+            self._send_error(error.status, str(error))
+            return
+        except Exception:
+            logger.exception("Query %s failed", self.path)
+            self._send_error(500, "Internal error while answering the query")
+            return
+
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')  # clients may keep it but revalidate with the ETag
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        body = json.dumps({'error': message}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+# Threaded HTTP server answering queries from service; each request runs in its own thread
+def make_server(service, host='127.0.0.1', port=8600, quiet=False):
+    handler = type('BoundQueryHandler', (QueryHandler,), {'service': service, 'quiet': quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve filtered import rows and map figures as JSON over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8600, help="Port to listen on (default: 8600)")
+    parser.add_argument('--store', default=STORE_DIR, help=f"Data store directory (default: {STORE_DIR})")
+    parser.add_argument('--csv', default=DEFAULT_CSV, help=f"CSV used when there is no store (default: {DEFAULT_CSV})")
+    parser.add_argument('--cache-entries', type=int, default=256, help="Responses kept in the cache (default: 256)")
+    parser.add_argument('--max-datasets', type=int, default=8, help="Year selections kept loaded (default: 8)")
+    parser.add_argument('--reload-interval', type=float, default=reload_interval_from_environment(),
+                        help="Seconds between checks of the data files for changes, 0 = never (default: 1)")
+    parser.add_argument('--quiet', action='store_true', help="Do not log each request")
+    args = parser.parse_args()
+
+    service = QueryService(args.store, args.csv, args.cache_entries, args.reload_interval, args.max_datasets)
+    service.dataset()  # load the default dataset before accepting requests
+    server = make_server(service, args.host, args.port, args.quiet)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+# Level-of-detail clustering for dense point layers.
+#
+# Points (e.g. ports of entry or foreign origin ports, one row each with a location and
+# an import value) are binned once into a hierarchy of lat/lon grids: level L splits the
+# world into 2^L x 2^L cells, each cell holding four cells of the level below. Cells are
+# numbered along a Z-order curve, so the cell of a point at any level is its finest cell
+# number shifted right, and the points are sorted by it once.
+#
+# A query for a map extent then walks that order: it picks the finest level at which the
+# points in view fall into at most max_points cells and returns one bubble per non-empty
+# cell, at the import-weighted center of its points, with their summed imports and
+# import-weighted tariff rate. When the points in view fit within max_points themselves,
+# they are returned one by one. Either way the number of bubbles drawn is bounded by
+# max_points however many points there are, and a query costs one pass over the points
+# in view.
+import numpy as np
+
+WORLD = (-180.0, 180.0, -90.0, 90.0)
+FINEST_LEVEL = 16  # cells of 0.0055 x 0.0027 degrees (a few hundred meters)
+DEFAULT_MAX_POINTS = 500
+
+
+# Spread the low 16 bits of each value to the even bit positions
+def _spread_bits(values):
+    values = values.astype(np.uint64) & 0xFFFF
+    values = (values | (values << 8)) & 0x00FF00FF
+    values = (values | (values << 4)) & 0x0F0F0F0F
+    values = (values | (values << 2)) & 0x33333333
+    values = (values | (values << 1)) & 0x55555555
+    return values
+
+
+# (lon_min, lon_max, lat_min, lat_max) shown by a plotly geo map centered on (lat, lon)
+# at the given projection scale (1 = whole world); approximate for curved projections
+def view_extent(center_lat=0.0, center_lon=0.0, scale=1.0):
+    lon_span, lat_span = 360.0 / scale, 180.0 / scale
+    if lon_span >= 360.0:
+        lon_min, lon_max = -180.0, 180.0
+    else:
+        lon_min = (center_lon - lon_span / 2 + 180.0) % 360.0 - 180.0
+        lon_max = (center_lon + lon_span / 2 + 180.0) % 360.0 - 180.0
+    return (lon_min, lon_max, max(center_lat - lat_span / 2, -90.0), min(center_lat + lat_span / 2, 90.0))
+
+
+class GridPyramid:
+    # lats, lons, imports (and optionally tariffs) hold one value per point; points
+    # without a location or import value are left out of every query
+    def __init__(self, lats, lons, imports, tariffs=None):
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.imports = np.asarray(imports, dtype=float)
+        self.tariffs = None if tariffs is None else np.asarray(tariffs, dtype=float)
+        self.num_points = len(self.lats)
+
+        located = np.isfinite(self.lats) & np.isfinite(self.lons) & np.isfinite(self.imports)
+        cells = 1 << FINEST_LEVEL
+        # Points without a location get cell 0 (they are never in view)
+        cols = np.clip(((np.where(located, self.lons, -180.0) + 180.0) / 360.0 * cells).astype(np.int64), 0, cells - 1)
+        rows = np.clip(((np.where(located, self.lats, -90.0) + 90.0) / 180.0 * cells).astype(np.int64), 0, cells - 1)
+        self.codes = _spread_bits(cols) | (_spread_bits(rows) << 1)
+
+        # Located points in Z order
+        self.order = np.flatnonzero(located)[np.argsort(self.codes[located], kind='stable')]
+
+    @classmethod
+    def from_frame(cls, points, lat='lat', lon='lon', imports='Imports ($B)', tariff='Tariff Rate'):
+        return cls(
+            points[lat].to_numpy(dtype=float),
+            points[lon].to_numpy(dtype=float),
+            points[imports].to_numpy(dtype=float),
+            points[tariff].to_numpy(dtype=float) if tariff in points.columns else None
+        )
+
+    # Located points within the extent, in Z order; rows (point positions, e.g. from
+    # FilterIndex.rows) restricts them further
+    def _points_in_view(self, extent, rows):
+        order = self.order
+        if rows is not None:
+            selected = np.zeros(self.num_points, dtype=bool)
+            selected[rows] = True
+            order = order[selected[order]]
+        lon_min, lon_max, lat_min, lat_max = extent
+        lats, lons = self.lats[order], self.lons[order]
+        inside = (lats >= lat_min) & (lats <= lat_max)
+        if lon_min <= lon_max:
+            inside &= (lons >= lon_min) & (lons <= lon_max)
+        else:  # the extent crosses the antimeridian
+            inside &= (lons >= lon_min) | (lons <= lon_max)
+        return order[inside]
+
+    # Finest level at which the points fall into at most max_points cells (binary search:
+    # the number of cells never decreases from one level to the next finer one)
+    def _level(self, codes, max_points):
+        def cells_at(level):
+            return codes >> np.uint64(2 * (FINEST_LEVEL - level))
+
+        low, high = 0, FINEST_LEVEL
+        while low < high:
+            level = (low + high + 1) // 2
+            cells = cells_at(level)
+            if np.count_nonzero(cells[1:] != cells[:-1]) + 1 <= max_points:
+                low = level
+            else:
+                high = level - 1
+        return low, cells_at(low)
+
+    # Bubbles for the points in view: a dict of arrays lat, lon, imports, tariff (NaN
+    # without tariffs), count (points per bubble) and row (the point's position, or -1 for
+    # clusters of several points), plus the grid level used (None when unclustered)
+    def clusters(self, extent=WORLD, max_points=DEFAULT_MAX_POINTS, rows=None):
+        points = self._points_in_view(extent, rows)
+        tariffs = self.tariffs[points] if self.tariffs is not None else np.full(len(points), np.nan)
+        if len(points) <= max_points:
+            return {
+                'lat': self.lats[points], 'lon': self.lons[points], 'imports': self.imports[points],
+                'tariff': tariffs, 'count': np.ones(len(points), dtype=np.int64), 'row': points, 'level': None
+            }
+
+        level, cells = self._level(self.codes[points], max_points)
+        starts = np.flatnonzero(np.concatenate(([True], cells[1:] != cells[:-1])))
+        counts = np.diff(np.append(starts, len(points)))
+
+        # Weight by imports; cells without any imports fall back to plain means
+        imports = self.imports[points]
+        total = np.add.reduceat(imports, starts)
+        weights = np.where(np.repeat(total, counts) > 0, imports, 1.0)
+        weight_sums = np.add.reduceat(weights, starts)
+
+        def weighted_mean(values):
+            return np.add.reduceat(values * weights, starts) / weight_sums
+
+        with np.errstate(invalid='ignore'):
+            has_tariff = np.isfinite(tariffs)
+            tariff_weights = np.add.reduceat(np.where(has_tariff, weights, 0.0), starts)
+            mean_tariffs = np.add.reduceat(np.where(has_tariff, tariffs * weights, 0.0), starts) / tariff_weights
+
+        return {
+            'lat': weighted_mean(self.lats[points]),
+            'lon': weighted_mean(self.lons[points]),
+            'imports': total,
+            'tariff': mean_tariffs,
+            'count': counts,
+            'row': np.where(counts == 1, points[starts], -1),
+            'level': level
+        }
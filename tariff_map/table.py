@@ -0,0 +1,56 @@
+# Server-side sorting and pagination for the data table.
+#
+# Only the rows of the requested page are sent to the browser, so the table payload
+# stays the same size whatever the size of the dataset or of the filtered selection.
+# The sort order of each column is computed once over the whole dataset; ordering a
+# filtered selection is then a single pass over that order instead of a new sort.
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PAGE_SIZE = 50
+
+
+class DataTable:
+    def __init__(self, data):
+        self.data = data
+        self.num_rows = len(data)
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    # Row ids of the whole dataset sorted by a column, missing values last
+    def sort_order(self, column, ascending=True):
+        key = (column, ascending)
+        with self._lock:
+            order = self._orders.get(key)
+            if order is None:
+                values = self.data[column].reset_index(drop=True)
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    # Categoricals sort by category position; sort by the values instead
+                    values = values.cat.reorder_categories(sorted(values.cat.categories))
+                order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+                self._orders[key] = order
+            return order
+
+    # Row ids (ascending positions, e.g. from FilterIndex.rows) in table order
+    def ordered_rows(self, rows, sort_column=None, ascending=True):
+        if sort_column is None:
+            return rows
+        selected = np.zeros(self.num_rows, dtype=bool)
+        selected[rows] = True
+        order = self.sort_order(sort_column, ascending)
+        return order[selected[order]]
+
+    # One page (numbered from 1) of the given rows, with the number of pages.
+    # Out-of-range page numbers are clamped to the first or last page.
+    def page(self, rows, sort_column=None, ascending=True, page=1, page_size=DEFAULT_PAGE_SIZE):
+        num_pages = max(1, math.ceil(len(rows) / page_size))
+        page = min(max(page, 1), num_pages)
+        start = (page - 1) * page_size
+        if sort_column is None:
+            page_rows = rows[start:start + page_size]
+        else:
+            page_rows = self.ordered_rows(rows, sort_column, ascending)[start:start + page_size]
+        return self.data.take(page_rows), num_pages
@@ -0,0 +1,75 @@
+# Tariff rates over time.
+#
+# The import data holds one tariff rate per country. A tariff schedule adds the dates on
+# which rates changed, one change per line:
+#
+#     CTY_CODE,Effective Date,Tariff Rate
+#     5700,2025-04-05,10%
+#     5700,2025-04-10,125%
+#     5700,2025-05-14,30%
+#
+# With the schedule saved as tariff_schedule.csv next to the data, the app offers a
+# timeline of the map: one animation frame per effective date, played and scrubbed in
+# the browser (see figure.create_tariff_animation). A country's rate at a date is its
+# latest change on or before that date; countries without a change by then keep the
+# rate of the import data.
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .data_store import parse_rate_column
+
+TARIFF_SCHEDULE_PATH = 'tariff_schedule.csv'
+SCHEDULE_COLUMNS = ['CTY_CODE', 'Effective Date', 'Tariff Rate']
+
+logger = logging.getLogger(__name__)
+
+
+# Read a schedule CSV, sorted by date (changes on the same date keep their file order).
+# Rows with a bad country code, date or rate are logged (by 1-based data row, as
+# data_store reports bad values) and skipped.
+def read_tariff_schedule(path=TARIFF_SCHEDULE_PATH):
+    raw = pd.read_csv(path, dtype={'Effective Date': str, 'Tariff Rate': 'category'})
+    missing = [name for name in SCHEDULE_COLUMNS if name not in raw.columns]
+    if missing:
+        raise ValueError(f"{path} is missing the columns {missing}")
+
+    codes = pd.to_numeric(raw['CTY_CODE'], errors='coerce').to_numpy(dtype=float)
+    dates = pd.to_datetime(raw['Effective Date'], errors='coerce', format='ISO8601')
+    rates, _ = parse_rate_column(raw['Tariff Rate'])
+    bad = np.isnan(codes) | (codes != np.round(codes)) | dates.isna().to_numpy() | np.isnan(rates)
+    if bad.any():
+        logger.warning("%s: skipped %d rows with a bad CTY_CODE, date or rate (data rows %s)",
+                       path, bad.sum(), ', '.join(map(str, np.flatnonzero(bad)[:20] + 1)))
+
+    schedule = pd.DataFrame({
+        'CTY_CODE': codes[~bad].astype(np.int32),
+        'Effective Date': dates[~bad].to_numpy(),
+        'Tariff Rate': rates[~bad].astype(np.float32)
+    })
+    return schedule.sort_values('Effective Date', kind='stable', ignore_index=True)
+
+
+# Rates of the given rows of data (all rows when None) at every effective date of the
+# schedule, computed in one pass. Returns the dates and a float32 array with one row per
+# date and one column per data row.
+def timeline_rates(data, schedule, rows=None):
+    base, codes = data['Tariff Rate'], data['CTY_CODE']
+    if rows is not None:
+        base, codes = base.take(rows), codes.take(rows)
+    if schedule.empty:
+        return pd.DatetimeIndex([], name='Effective Date'), np.empty((0, len(base)), dtype=np.float32)
+
+    # Latest rate per date and country, carried forward to the later dates
+    changes = schedule.pivot_table(
+        index='Effective Date', columns='CTY_CODE', values='Tariff Rate', aggfunc='last'
+    ).ffill()
+    scheduled = changes.to_numpy(dtype=np.float32)
+
+    # Column per data row; -1 (no changes for the country) picks an all-NaN column
+    positions = changes.columns.get_indexer(codes.to_numpy())
+    scheduled = np.concatenate([scheduled, np.full((len(scheduled), 1), np.nan, dtype=np.float32)], axis=1)
+    values = scheduled[:, positions]
+    rates = np.where(np.isnan(values), base.to_numpy(dtype=np.float32)[None, :], values)
+    return changes.index, rates
@@ -0,0 +1,140 @@
+# Summary charts shown next to the map, all drawn from the rows matching the map filters.
+#
+# The matching rows are read once into a slice holding the few columns the charts use,
+# and the missing charts are built from that slice one after the other (each takes a few
+# milliseconds of mostly GIL-bound plotly work, so a thread pool gains nothing). Charts
+# are cached one by one (see cached_views): changing the options of one chart rebuilds
+# that chart only, and options of the map (e.g. the swing-state highlight) rebuild none
+# of them.
+import numpy as np
+import plotly.graph_objects as go
+
+# Bands of the tariff band chart: label and lower bound (%); the last band is open-ended
+TARIFF_BANDS = [('0–9%', 0), ('10–19%', 10), ('20–29%', 20), ('30–49%', 30), ('50%+', 50)]
+VIEW_HEIGHT = 380
+SWING_COLOR = 'rgb(128,0,128)'  # as the swing-state shading of the map
+OTHER_COLOR = 'rgb(150,150,150)'
+
+
+# Columns of the charts for the given row positions (e.g. from FilterIndex.rows)
+def view_slice(data, rows):
+    return {
+        'imports': np.nan_to_num(data['Imports ($B)'].take(rows).to_numpy(dtype=float)),
+        'tariffs': data['Tariff Rate'].take(rows).to_numpy(dtype=float),
+        'swing': data['Geopolitical_swing_state'].take(rows).to_numpy(dtype=bool)
+    }
+
+
+def _chart_layout(fig, title, **layout):
+    fig.update_layout(
+        title=dict(text=title, font=dict(size=16)),
+        height=VIEW_HEIGHT,
+        margin=dict(l=10, r=10, t=50, b=10),
+        showlegend=False,
+        **layout
+    )
+    return fig
+
+
+# Imports (or number of countries) per tariff band, largest band on top, colored like the
+# map bubbles
+def tariff_band_chart(columns, measure='imports'):
+    bounds = np.array([bound for _, bound in TARIFF_BANDS])
+    bands = np.clip(np.searchsorted(bounds, columns['tariffs'], side='right') - 1, 0, len(bounds) - 1)
+    imports = np.bincount(bands, weights=columns['imports'], minlength=len(bounds))
+    counts = np.bincount(bands, minlength=len(bounds))
+    values = imports if measure == 'imports' else counts
+    order = np.argsort(values, kind='stable')  # horizontal bars are drawn bottom up
+
+    fig = go.Figure(go.Bar(
+        x=values[order],
+        y=[TARIFF_BANDS[band][0] for band in order],
+        orientation='h',
+        marker=dict(color=bounds[order], coloraxis='coloraxis', line=dict(width=1, color='black')),
+        customdata=np.column_stack([imports[order], counts[order]]),
+        hovertemplate=(
+            "Tariff band: %{y}<br>"
+            "Imports: $%{customdata[0]:,.2f} Billion<br>"
+            "Countries: %{customdata[1]:,}"
+            "<extra></extra>"
+        )
+    ))
+    return _chart_layout(
+        fig, "Imports by Tariff Band" if measure == 'imports' else "Countries by Tariff Band",
+        coloraxis=dict(colorscale='Hot_r', cmin=0, cmax=50, showscale=False),
+        xaxis_title="Imports (Billion USD)" if measure == 'imports' else "Countries"
+    )
+
+
+# Number of countries per tariff rate bin of bin_width percentage points; the bins are
+# counted here so only one bar per bin is sent, not one value per country
+def tariff_histogram(columns, bin_width=5):
+    tariffs = columns['tariffs']
+    low = np.floor(tariffs.min() / bin_width) * bin_width if len(tariffs) else 0.0
+    high = tariffs.max() if len(tariffs) else 0.0
+    edges = np.arange(low, high + bin_width, bin_width)
+    if len(edges) < 2:
+        edges = np.array([low, low + bin_width])
+    counts, edges = np.histogram(tariffs, edges)
+
+    fig = go.Figure(go.Bar(
+        x=edges[:-1] + bin_width / 2,
+        y=counts,
+        width=bin_width,
+        marker=dict(color='rgb(158, 202, 225)', line=dict(width=1, color='rgb(80, 80, 80)')),
+        customdata=np.column_stack([edges[:-1], edges[1:]]),
+        hovertemplate="Tariff rate: %{customdata[0]}–%{customdata[1]}%<br>Countries: %{y:,}<extra></extra>"
+    ))
+    return _chart_layout(fig, "Distribution of Tariff Rates", xaxis_title="Tariff Rate (%)", yaxis_title="Countries", bargap=0)
+
+
+# Swing states against the other countries: total imports, import-weighted tariff rate
+# and number of countries
+def swing_comparison_chart(columns):
+    from plotly.subplots import make_subplots
+
+    imports, tariffs, swing = columns['imports'], columns['tariffs'], columns['swing']
+    groups = [swing, ~swing]
+    totals = np.array([imports[group].sum() for group in groups])
+    duties = np.array([(imports[group] * tariffs[group]).sum() for group in groups])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weighted_tariffs = np.where(totals > 0, duties / totals, np.nan)
+    counts = np.array([group.sum() for group in groups])
+
+    metrics = [
+        ("Imports (Billion USD)", totals, "$%{y:,.2f} Billion"),
+        ("Import-weighted tariff (%)", weighted_tariffs, "%{y:.1f}%"),
+        ("Countries", counts, "%{y:,}")
+    ]
+    fig = make_subplots(rows=1, cols=len(metrics), subplot_titles=[title for title, _, _ in metrics])
+    for col, (_, values, value_format) in enumerate(metrics, start=1):
+        fig.add_trace(go.Bar(
+            x=["Swing states", "Other"],
+            y=values,
+            marker=dict(color=[SWING_COLOR, OTHER_COLOR]),
+            hovertemplate="%{x}: " + value_format + "<extra></extra>"
+        ), row=1, col=col)
+    return _chart_layout(fig, "Geopolitical Swing States vs. Other Countries")
+
+
+VIEW_BUILDERS = {
+    'tariff_bands': tariff_band_chart,
+    'tariff_histogram': tariff_histogram,
+    'swing_comparison': swing_comparison_chart
+}
+
+
+# Return the requested charts (name -> options dict, see VIEW_BUILDERS) for the given
+# rows of data (e.g. from FilterIndex.rows), identified by filter_key (figure.filter_key),
+# so figure_unaffected applies to the cached charts too. Only the charts missing from the
+# cache are built, from one slice of the rows.
+def cached_views(cache, filter_key, data, rows, views, data_version=None):
+    keys = {name: filter_key + (name, tuple(sorted(options.items()))) for name, options in views.items()}
+    figures = {name: cache.get(key, data_version) for name, key in keys.items()}
+    missing = [name for name, fig in figures.items() if fig is None]
+    if missing:
+        columns = view_slice(data, rows)
+        for name in missing:
+            figures[name] = VIEW_BUILDERS[name](columns, **views[name])
+            cache.put(keys[name], figures[name], data_version)
+    return figures
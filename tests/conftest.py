@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+NAMES = ['Brazil', 'Canada', 'China', 'France', 'Germany', 'India', 'Japan', 'Mexico', 'Taiwan', 'Vietnam']
+
+
+# Import data with repeated values and missing imports and tariffs, in the dtypes of
+# data_store.IMPORT_SCHEMA
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    num_rows = 300
+    imports = rng.choice(np.round(rng.uniform(0, 50, 80), 2), num_rows).astype(np.float32)
+    tariffs = rng.choice(np.arange(0, 60, 5), num_rows).astype(np.float32)
+    imports[rng.random(num_rows) < 0.05] = np.nan
+    tariffs[rng.random(num_rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        'year': np.full(num_rows, 2024, dtype=np.int16),
+        'CTY_CODE': np.arange(1000, 1000 + num_rows, dtype=np.int32),
+        'CTYNAME': pd.Categorical(rng.choice(NAMES, num_rows)),
+        'Imports ($B)': imports,
+        'Exports ($B)': np.zeros(num_rows, dtype=np.float32),
+        'Tariff Rate': tariffs,
+        'Geopolitical_swing_state': rng.random(num_rows) < 0.3
+    })
+
+
+# (min_imports, max_imports, min_tariff, max_tariff, countries) queries, including
+# empty and unbounded ones
+@pytest.fixture
+def queries():
+    rng = np.random.default_rng(1)
+    queries = [(-np.inf, np.inf, -np.inf, np.inf, ()), (0.0, 50.0, 0.0, 55.0, ()), (30.0, 10.0, 0.0, 55.0, ())]
+    for _ in range(40):
+        imports = np.sort(rng.uniform(-5, 55, 2))
+        tariffs = np.sort(rng.choice(np.arange(-5, 65, 2.5), 2))
+        countries = tuple(rng.choice(NAMES + ['Nowhere'], rng.integers(0, 4), replace=False))
+        queries.append((*imports, *tariffs, countries))
+    return queries
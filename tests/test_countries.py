@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+
+from tariff_map.countries import build_country_index, country_aliases, country_coords, resolve_country_name
+from tariff_map.data_store import read_import_csv
+
+SHIPPED_CSV = os.path.join(os.path.dirname(__file__), '..', 'US_2024_Import_Data.csv')
+
+
+# The lookup the map used before the country index: exact key, else the first key (in
+# country_coords order) containing the name or contained in it, else no bubble
+def original_lookup(name):
+    if name in country_coords:
+        return name
+    for coord_country in country_coords:
+        if name in coord_country or coord_country in name:
+            return coord_country
+    return None
+
+
+# Only the aliased names resolve differently; every other country keeps its bubble
+def test_resolution_matches_original_lookup_but_for_aliases():
+    names = read_import_csv(SHIPPED_CSV)['CTYNAME'].cat.categories
+    changed = {name for name in names if resolve_country_name(name) != original_lookup(name)}
+    assert changed == {"Côte d'Ivoire"}
+    assert set(changed) <= set(country_aliases)
+    assert original_lookup("Côte d'Ivoire") is None
+    assert resolve_country_name("Côte d'Ivoire") == "Cote d'Ivoire"
+
+
+def test_index_lists_unresolved_and_unnamed_codes():
+    data = pd.DataFrame({
+        'CTY_CODE': [5700, 5700, 9999, 8888],
+        'CTYNAME': pd.Categorical([None, 'China', 'Atlantis', None])
+    })
+    country_index, unresolved = build_country_index(data)
+    assert country_index.loc[5700, 'country'] == 'China'
+    assert country_index.loc[[9999, 8888], 'lat'].isna().all()
+    assert unresolved == ['Atlantis', 'CTY_CODE 8888 (no name)']
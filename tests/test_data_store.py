@@ -0,0 +1,35 @@
+import numpy as np
+
+from tariff_map.data_store import IMPORT_SCHEMA, parse_import_csv
+
+CSV = """year,CTY_CODE,CTYNAME,Imports ($B),Exports ($B),Tariff Rate,Geopolitical_swing_state
+2024,5700,China,438.9,143.5,34%,FALSE
+2024,12x0,Canada,412.7,349.4,10%,FALSE
+
+2024,2010,Mexico,505.9,334.0,25%,TRUE
+2024,4280, ,160.5,76.3,20%,FALSE
+2024,5830,Taiwan,116.3,42.3,about 32%,TRUE
+2024,5520,Vietnam,136.6,13.1,46%,maybe
+"""
+
+
+def test_parse_import_csv(tmp_path):
+    path = tmp_path / 'imports.csv'
+    path.write_text(CSV)
+    data, bad_rows = parse_import_csv(path)
+
+    # The bad CTY_CODE and the blank name drop their rows
+    assert data['CTYNAME'].tolist() == ['China', 'Mexico', 'Taiwan', 'Vietnam']
+    assert {name: str(dtype) for name, dtype in data.dtypes.items()} == IMPORT_SCHEMA
+    assert data['CTY_CODE'].tolist() == [5700, 2010, 5830, 5520]
+    # A bad percent becomes missing and a bad flag False
+    np.testing.assert_array_equal(data['Tariff Rate'], np.array([34, 25, np.nan, 46], dtype=np.float32))
+    assert data['Geopolitical_swing_state'].tolist() == [False, True, True, False]
+
+    # Rows are counted without the header and the blank line
+    assert bad_rows.to_dict('records') == [
+        {'row': 2, 'column': 'CTY_CODE', 'value': '12x0', 'problem': 'not a valid int32, row dropped'},
+        {'row': 4, 'column': 'CTYNAME', 'value': ' ', 'problem': 'missing, row dropped'},
+        {'row': 5, 'column': 'Tariff Rate', 'value': 'about 32%', 'problem': 'not a valid float32, set to missing'},
+        {'row': 6, 'column': 'Geopolitical_swing_state', 'value': 'maybe', 'problem': 'not a valid bool, set to False'},
+    ]
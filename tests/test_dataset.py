@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from tariff_map.dataset import Dataset, align_rows, changed_rows
+from tariff_map.figure import FigureCache, figure_unaffected, filter_key
+
+
+# New version of the data: some imports and tariffs changed (also to missing) and one
+# country renamed, in a shuffled row order
+def new_version(data, rows=(4, 9, 120, 250)):
+    new = data.copy()
+    rows = list(rows)
+    new.loc[rows, 'Imports ($B)'] = np.array([np.nan, 3.5, 45.0, 0.25], dtype=np.float32)
+    new.loc[rows, 'Tariff Rate'] = np.array([20.0, np.nan, 0.0, 50.0], dtype=np.float32)
+    names = new['CTYNAME'].cat.add_categories(['New Land'])
+    names[rows[2]] = 'New Land'
+    new['CTYNAME'] = names
+    return new.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def test_align_rows_finds_the_changed_rows(data):
+    aligned, rows = align_rows(data, new_version(data))
+    np.testing.assert_array_equal(rows, [4, 9, 120, 250])
+    np.testing.assert_array_equal(aligned['CTY_CODE'], data['CTY_CODE'])
+    assert aligned['CTYNAME'][120] == 'New Land'
+
+
+def test_align_rows_rejects_added_rows(data):
+    assert align_rows(data, pd.concat([data, data.tail(1).assign(CTY_CODE=np.int32(9999))])) == (None, None)
+    assert align_rows(data, data.iloc[1:]) == (None, None)
+
+
+def test_with_changed_rows_matches_rebuild(data, queries):
+    old = Dataset(data)
+    aligned, rows = align_rows(data, new_version(data))
+    updated = old.with_changed_rows(aligned, rows)
+    rebuilt = Dataset(aligned)
+    for query in queries + [(-np.inf, np.inf, -np.inf, np.inf, ('New Land',))]:
+        np.testing.assert_array_equal(updated.filter_index.rows(*query), rebuilt.filter_index.rows(*query))
+    assert updated.options == rebuilt.options
+    assert updated.unresolved == rebuilt.unresolved == ['New Land']
+    pd.testing.assert_frame_equal(updated.country_index, rebuilt.country_index)
+
+
+# Entries that FigureCache.advance carries over (figure_unaffected) must still be right
+# for the new version: here each "figure" is the list of rows its filter selects
+def test_advance_keeps_only_figures_still_valid(data, queries):
+    old = Dataset(data)
+    aligned, rows = align_rows(data, new_version(data))
+    new = old.with_changed_rows(aligned, rows)
+    changed = changed_rows(old.data, new.data, rows)
+
+    cache = FigureCache(max_entries=len(queries))
+    keys = []
+    for query in queries:
+        key = filter_key('data', *query, filter_index=old.filter_index)
+        keys.append((key, query))
+        cache.put(key, old.filter_index.rows(*query).tolist(), old.version)
+    cache.advance(old.version, new.version, lambda key: figure_unaffected(key, changed))
+
+    kept = 0
+    for key, query in keys:
+        rows = cache.get(key, new.version)
+        if rows is not None:
+            kept += 1
+            assert rows == new.filter_index.rows(*query).tolist()
+    assert 0 < kept < len(keys)
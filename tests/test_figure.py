@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tariff_map.countries import build_country_index
+from tariff_map.figure import create_bubble_map
+from tariff_map.filtering import FilterIndex
+
+
+# The compact figure sends tariff rates as float32 marker colors; the hover must round
+# them instead of printing the float32 value
+def test_compact_hover_rounds_tariff_rates(data):
+    country_index, _ = build_country_index(data)
+    fig = create_bubble_map(data, 0, 50, 0, 60, [], country_index=country_index, compact=True)
+    bubbles = [trace for trace in fig.data if trace.type == 'scattergeo']
+    assert bubbles
+    for trace in bubbles:
+        assert "Tariff Rate: %{marker.color:.4~f}%" in trace.hovertemplate
+
+
+# Small frame in the dtypes of data_store.IMPORT_SCHEMA: an unknown country, a row above
+# the tariff range and Côte d'Ivoire (drawn since the alias table, not by the original map)
+def small_data():
+    return pd.DataFrame({
+        'year': np.full(9, 2024, dtype=np.int16),
+        'CTY_CODE': np.array([5700, 2010, 5520, 7990, 1220, 4091, 9999, 7480, 5830], dtype=np.int32),
+        'CTYNAME': pd.Categorical(['China', 'Mexico', 'Vietnam', 'Lesotho', 'Canada', 'Faroe Islands', 'Atlantis', "Côte d'Ivoire", 'Taiwan']),
+        'Imports ($B)': np.array([438.9, 505.9, 136.6, 0.237, 12.5, 5.0, 3.0, 1.0146, 116.3], dtype=np.float32),
+        'Exports ($B)': np.zeros(9, dtype=np.float32),
+        'Tariff Rate': np.array([34, 25, 46, 50, 10, 10, 10, 21, 60], dtype=np.float32),
+        'Geopolitical_swing_state': np.array([False, True, True, False, False, False, False, False, True])
+    })
+
+
+# The columns of the original per-row loop for small_data (0-1000 $B, 0-55%)
+EXPECTED_REGULAR = {
+    'lon': [104.1954, 28.2336, -106.3468, -6.9118, -5.5471],
+    'lat': [35.8617, -29.6100, 56.1304, 61.8926, 7.5400],
+    'size': [5 + 8 * np.log2(438.9), 5, 20, 10, 10],
+    'color': [34.0, 50.0, 10.0, 10.0, 21.0],
+    'text': ['China', 'Lesotho', 'Canada', 'Faroe Islands', "Cote d'Ivoire"]
+}
+EXPECTED_SWING = {
+    'lon': [-102.5528, 108.2772],
+    'lat': [23.6345, 14.0583],
+    'size': [5 + 8 * np.log2(505.9), 5 + 8 * np.log2(136.6)],
+    'color': [25.0, 46.0],
+    'text': ['Mexico', 'Vietnam']
+}
+
+
+def assert_bubbles(trace, expected):
+    np.testing.assert_allclose(trace.lon, expected['lon'])
+    np.testing.assert_allclose(trace.lat, expected['lat'])
+    np.testing.assert_allclose(trace.marker.size, expected['size'], rtol=1e-6)
+    np.testing.assert_allclose(trace.marker.color, expected['color'])
+    assert list(trace.text) == expected['text']
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_bubble_traces_match_the_original_loop(indexed):
+    data = small_data()
+    country_index, unresolved = build_country_index(data)
+    assert unresolved == ['Atlantis']
+    fig = create_bubble_map(data, 0, 1000, 0, 55, [], country_index=country_index, filter_index=FilterIndex(data) if indexed else None)
+
+    shading, regular, swing, colorbar = fig.data
+    assert list(shading.locations) == ['CHN', 'USA', 'MEX', 'VNM']
+    assert list(shading.z) == [1, 2, 3, 3]
+    assert_bubbles(regular, EXPECTED_REGULAR)
+    assert_bubbles(swing, EXPECTED_SWING)
+    assert regular.hovertext[0] == "Country: China<br>Imports: $438.90 Billion<br>Tariff Rate: 34.0%<br>Geopolitical Swing State: No"
+    assert swing.hovertext[1] == "Country: Vietnam<br>Imports: $136.60 Billion<br>Tariff Rate: 46.0%<br>Geopolitical Swing State: Yes"
+    assert colorbar.marker.cmin == 0 and colorbar.marker.showscale
+
+
+# The compact figure draws the same bubbles
+def test_compact_bubbles_match_the_full_figure():
+    data = small_data()
+    country_index, _ = build_country_index(data)
+    fig = create_bubble_map(data, 0, 1000, 0, 55, [], country_index=country_index, compact=True)
+    regular, swing = [trace for trace in fig.data if trace.type == 'scattergeo']
+    for trace, expected in [(regular, EXPECTED_REGULAR), (swing, EXPECTED_SWING)]:
+        np.testing.assert_allclose(trace.lon, expected['lon'], rtol=1e-6)
+        np.testing.assert_allclose(trace.lat, expected['lat'], rtol=1e-6)
+        np.testing.assert_allclose(trace.marker.size, expected['size'], rtol=1e-6)
+        np.testing.assert_allclose(trace.marker.color, expected['color'])
+        assert list(trace.text) == expected['text']
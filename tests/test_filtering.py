@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from tariff_map.filtering import FilterIndex, filter_data
+
+
+def expected_rows(data, query):
+    return np.flatnonzero(data.index.isin(filter_data(data, *query).index))
+
+
+def test_rows_match_filter_data(data, queries):
+    index = FilterIndex(data)
+    for query in queries:
+        np.testing.assert_array_equal(index.rows(*query), expected_rows(data, query))
+
+
+# Change imports and tariffs of some rows, to and from missing values
+def change_values(data, rows, seed=1):
+    rng = np.random.default_rng(seed)
+    new = data.copy()
+    new.loc[rows, 'Imports ($B)'] = rng.choice([np.nan, 0.5, 12.25, 49.0], len(rows)).astype(np.float32)
+    new.loc[rows, 'Tariff Rate'] = rng.choice([np.nan, 0.0, 25.0, 55.0], len(rows)).astype(np.float32)
+    return new
+
+
+@pytest.mark.parametrize('rows', [[0], [5, 17, 42], list(range(0, 300, 7)), []])
+def test_updated_matches_rebuild(data, queries, rows):
+    new = change_values(data, rows)
+    updated = FilterIndex(data).updated(new, rows)
+    rebuilt = FilterIndex(new)
+    for query in queries:
+        np.testing.assert_array_equal(updated.rows(*query), rebuilt.rows(*query))
+
+
+def test_updated_matches_rebuild_after_rename(data, queries):
+    rows = [3, 8, 150]
+    new = change_values(data, rows)
+    names = new['CTYNAME'].cat.add_categories(['New Land'])
+    names[3], names[8] = 'New Land', 'Japan' if data['CTYNAME'][8] != 'Japan' else 'Mexico'
+    new['CTYNAME'] = names
+    updated = FilterIndex(data).updated(new, rows)
+    rebuilt = FilterIndex(new)
+    for query in queries + [(-np.inf, np.inf, -np.inf, np.inf, ('New Land',))]:
+        np.testing.assert_array_equal(updated.rows(*query), rebuilt.rows(*query))
+
+
+def test_updated_leaves_original_index_unchanged(data, queries):
+    index = FilterIndex(data)
+    before = [index.rows(*query) for query in queries]
+    index.updated(change_values(data, [1, 2, 3]), [1, 2, 3])
+    for query, rows in zip(queries, before):
+        np.testing.assert_array_equal(index.rows(*query), rows)
+
+
+@pytest.mark.parametrize('column, name', [('imports', 'Imports ($B)'), ('tariffs', 'Tariff Rate')])
+def test_widest_range_selects_the_same_rows(data, column, name):
+    index = FilterIndex(data)
+    values = np.unique(data[name].dropna().to_numpy(dtype=float))
+    for low, high in [(10.0, 30.0), (values[0], values[-1]), (values[3], values[3]), (-1.0, 100.0), (10.1, 10.2)]:
+        widest_low, widest_high = index.widest_range(column, low, high)
+        assert widest_low < low and widest_high > high
+        # No value between the widest range and [low, high]
+        assert np.all((values <= widest_low) | (values >= widest_high) | ((values >= low) & (values <= high)))
+
+        def rows(low, high):
+            bounds = (low, high, -np.inf, np.inf) if column == 'imports' else (-np.inf, np.inf, low, high)
+            return index.rows(*bounds)
+
+        inside = rows(np.nextafter(widest_low, np.inf), np.nextafter(widest_high, -np.inf))
+        np.testing.assert_array_equal(inside, rows(low, high))
+        if np.isfinite(widest_low):
+            assert len(rows(widest_low, high)) > len(inside)
+        if np.isfinite(widest_high):
+            assert len(rows(low, widest_high)) > len(inside)
+
+
+@pytest.mark.parametrize('column, name', [('imports', 'Imports ($B)'), ('tariffs', 'Tariff Rate')])
+def test_range_steps_are_the_nearest_values_that_change_the_rows(data, column, name):
+    index = FilterIndex(data)
+    values = np.unique(data[name].dropna().to_numpy(dtype=float))
+
+    def nearest(candidates, pick):
+        return float(pick(candidates)) if len(candidates) else None
+
+    for low, high in [(10.0, 30.0), (values[0], values[-1]), (values[3], values[3]), (-1.0, 100.0), (values[-1] + 1, 200.0)]:
+        selected = values[(values >= low) & (values <= high)]
+        expected = (
+            nearest(values[values < low], np.max),
+            nearest(values[values > selected[0]], np.min) if len(selected) else None,
+            nearest(values[values < selected[-1]], np.max) if len(selected) else None,
+            nearest(values[values > high], np.min)
+        )
+        assert index.range_steps(column, low, high) == expected
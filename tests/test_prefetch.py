@@ -0,0 +1,116 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from tariff_map.figure import filter_key
+from tariff_map.filtering import FilterIndex
+from tariff_map.prefetch import Prefetcher, neighbor_states
+
+
+def small_index():
+    return FilterIndex(pd.DataFrame({
+        'CTYNAME': pd.Categorical(['A', 'B', 'C', 'D', 'E']),
+        'Imports ($B)': np.array([1.0, 2.0, 5.0, 9.0, 9.0], dtype=np.float32),
+        'Tariff Rate': np.array([0.0, 10.0, 25.0, 25.0, 40.0], dtype=np.float32)
+    }))
+
+
+# Slider positions between the same two data values select the same rows and share one
+# cache entry; positions selecting other rows do not
+def test_same_rows_share_a_filter_key():
+    index = small_index()
+    key = filter_key('data', 1.5, 8.0, 5.0, 30.0, ['B', 'A'], index)
+    assert filter_key('data', 1.2, 5.0, 0.5, 39.0, ['A', 'B'], index) == key
+    assert filter_key('data', 2.0, 8.9, 10.0, 25.0, ('A', 'B'), index) == key
+    assert filter_key('data', 2.5, 8.0, 5.0, 30.0, ['A', 'B'], index) != key
+    assert filter_key('data', 1.5, 9.0, 5.0, 30.0, ['A', 'B'], index) != key
+    assert filter_key('data', 1.5, 8.0, 5.0, 30.0, ['A'], index) != key
+    assert filter_key('other', 1.5, 8.0, 5.0, 30.0, ['A', 'B'], index) != key
+
+
+def test_neighbor_states():
+    states = neighbor_states(small_index(), (1.5, 8.0), (5.0, 30.0), ['A'], False, (0.0, 40.0))
+    assert states == [
+        (1.5, 8.0, 5.0, 30.0, ('A',), True),     # highlight toggled
+        (1.0, 8.0, 5.0, 30.0, ('A',), False),    # low import end down to include 1
+        (5.0, 8.0, 5.0, 30.0, ('A',), False),    # up past 2
+        (1.5, 2.0, 5.0, 30.0, ('A',), False),    # high import end down past 5
+        (1.5, 9.0, 5.0, 30.0, ('A',), False),    # up to include 9
+        (1.5, 8.0, 4.0, 30.0, ('A',), False),    # low tariff end by one slider step
+        (1.5, 8.0, 6.0, 30.0, ('A',), False),
+        (1.5, 8.0, 5.0, 10.0, ('A',), False),    # high tariff end down past 25
+        (1.5, 8.0, 5.0, 40.0, ('A',), False)     # up to include 40
+    ]
+
+
+# Every neighbor state selects other rows than the current state, and the rerun after a
+# slider moved anywhere between the same two values finds the neighbor's cache key
+def test_neighbor_states_hit_the_keys_of_real_reruns():
+    index = small_index()
+    current = filter_key('data', 1.5, 8.0, 5.0, 30.0, (), index)
+    states = neighbor_states(index, (1.5, 8.0), (5.0, 30.0), (), False, (0.0, 40.0))
+    keys = [filter_key('data', *state[:5], index) for state in states[1:]]
+    assert current not in keys[:4] + keys[6:]
+    assert filter_key('data', 3.0, 8.0, 5.0, 30.0, (), index) == keys[1]   # low import end past 2
+    assert filter_key('data', 1.5, 4.0, 5.0, 30.0, (), index) == keys[2]   # high import end below 5
+    assert filter_key('data', 1.5, 8.0, 5.0, 20.0, (), index) == keys[6]   # high tariff end below 25
+
+
+def test_empty_selection_only_widens():
+    states = neighbor_states(small_index(), (3.0, 4.0), (5.0, 30.0), (), False, (0.0, 40.0))
+    assert (2.0, 4.0, 5.0, 30.0, (), False) in states
+    assert (3.0, 5.0, 5.0, 30.0, (), False) in states
+    assert all(state[0] <= state[1] for state in states)
+
+
+def recorder(log, name):
+    return lambda: log.append(name)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+# A new rerun replaces the session's pending tasks and cancel drops them
+def test_new_request_replaces_pending_tasks():
+    prefetcher, log = Prefetcher(delay=0.1), []
+    prefetcher.request('session', [recorder(log, 'old 1'), recorder(log, 'old 2')])
+    prefetcher.request('session', [recorder(log, 'new')])
+    assert prefetcher.pending('session') == 1
+    assert wait_for(lambda: log == ['new'])
+
+    prefetcher.request('session', [recorder(log, 'dropped')])
+    prefetcher.cancel('session')
+    time.sleep(0.2)
+    assert log == ['new'] and prefetcher.pending() == 0
+
+
+# Tasks start after the delay and sessions whose delay has passed take turns (the first
+# task outlasts the few microseconds between the two requests, so both are ready after it)
+def test_tasks_wait_for_the_delay_and_sessions_take_turns():
+    prefetcher, log = Prefetcher(delay=0.1), []
+    started = time.monotonic()
+    first_run = threading.Event()
+
+    def first():
+        first_run.set()
+        time.sleep(0.01)
+        log.append('a1')
+
+    prefetcher.request('a', [first, recorder(log, 'a2'), recorder(log, 'a3')])
+    prefetcher.request('b', [recorder(log, 'b1'), recorder(log, 'b2')])
+    assert first_run.wait(2.0)
+    assert time.monotonic() - started >= 0.1
+    assert wait_for(lambda: len(log) == 5)
+    assert log == ['a1', 'b1', 'a2', 'b2', 'a3']
+
+
+def test_failed_task_does_not_stop_the_worker():
+    prefetcher, log = Prefetcher(delay=0.0), []
+    prefetcher.request('session', [lambda: 1 / 0, recorder(log, 'after')])
+    assert wait_for(lambda: log == ['after'])
@@ -0,0 +1,45 @@
+import numpy as np
+
+from tariff_map.scenarios import country_arrays, deficit_rates, evaluate, run_monte_carlo, summarize
+
+
+def test_evaluate_totals():
+    rates = np.array([[10.0, 20.0, 0.0], [50.0, 0.0, 100.0]])
+    results = evaluate(rates, [100.0, 50.0, 10.0], np.array([False, True, False]), keep_duties=True)
+    np.testing.assert_allclose(results['duties'], [[10.0, 10.0, 0.0], [50.0, 0.0, 10.0]])
+    np.testing.assert_allclose(results['total_duties'], [20.0, 60.0])
+    np.testing.assert_allclose(results['swing_duties'], [10.0, 0.0])
+    np.testing.assert_allclose(results['swing_share'], [0.5, 0.0])
+    np.testing.assert_allclose(results['average_rate'], [20.0 / 160 * 100, 60.0 / 160 * 100])
+
+
+def test_deficit_rates():
+    rates = deficit_rates([100.0, 100.0, 0.0, np.nan, 100.0], [20.0, 150.0, 5.0, 5.0, np.nan], discount=[0.5, 1.0])
+    np.testing.assert_allclose(rates, [
+        [40.0, 10.0, 10.0, 10.0, 50.0],
+        [80.0, 10.0, 10.0, 10.0, 100.0]
+    ])
+
+
+# A missing rate or import value (unparseable in the CSV) leaves the row out instead of
+# turning every total into NaN
+def test_rows_without_rate_or_imports_are_left_out(data):
+    complete = data.dropna(subset=['Imports ($B)', 'Tariff Rate'])
+    assert len(complete) < len(data)
+    arrays = country_arrays(data)
+    np.testing.assert_array_equal(arrays['CTY_CODE'], complete['CTY_CODE'])
+
+    results = evaluate(arrays['rates'][None, :], arrays['imports'], arrays['swing'])
+    assert all(np.isfinite(values).all() for values in results.values())
+    assert results['swing_share'][0] > 0
+    summary = summarize(run_monte_carlo(data, 1000, seed=0))
+    assert all(np.isfinite(value) for metric in summary.values() for value in metric.values())
+
+
+# Batches are seeded up front, so the pool only changes where they run
+def test_monte_carlo_does_not_depend_on_workers(data):
+    sequential = run_monte_carlo(data, 5000, seed=3, batch_size=1000, workers=1)
+    pooled = run_monte_carlo(data, 5000, seed=3, batch_size=1000, workers=2)
+    assert sequential.keys() == pooled.keys()
+    for name in sequential:
+        np.testing.assert_array_equal(sequential[name], pooled[name])
@@ -0,0 +1,123 @@
+import http.client
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from tariff_map.service import QueryService, make_server
+
+
+# The data fixture written as an import data CSV ("10%" rates, TRUE / FALSE flags)
+@pytest.fixture
+def service(data, tmp_path):
+    csv = data.assign(
+        **{'Tariff Rate': data['Tariff Rate'].map('{:g}%'.format).where(data['Tariff Rate'].notna(), ''),
+           'Geopolitical_swing_state': np.where(data['Geopolitical_swing_state'], 'TRUE', 'FALSE')}
+    )
+    path = tmp_path / 'imports.csv'
+    csv.to_csv(path, index=False)
+    return QueryService(store_dir=str(tmp_path / 'store'), csv_path=str(path))
+
+
+def start_server(service):
+    server = make_server(service, port=0, quiet=True)
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True).start()
+    return server
+
+
+def stop_server(server):
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def server(service):
+    server = start_server(service)
+    yield server
+    stop_server(server)
+
+
+def get(server, path, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address)
+    try:
+        connection.request('GET', path, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.getheader('ETag'), response.read()
+    finally:
+        connection.close()
+
+
+def test_equivalent_queries_share_a_response(service):
+    body, etag = service.respond('rows', {'min_imports': ['1'], 'max_tariff': ['30'], 'country': ['China', 'Mexico']})
+    same = service.respond('rows', {'min_imports': ['1.0'], 'max_tariff': ['3e1'], 'country': ['Mexico', 'China', 'China']})
+    assert same == (body, etag)
+    assert 0 < json.loads(body)['count'] < 300
+    # Missing bounds default to the bounds of the data
+    options = json.loads(service.respond('options', {})[0])
+    unbounded = service.respond('rows', {})
+    bounded = service.respond('rows', {'min_imports': [str(options['imports'][0])], 'max_tariff': [str(options['tariffs'][1])]})
+    assert bounded == unbounded
+
+
+def test_not_modified_for_matching_etag(server):
+    status, etag, body = get(server, '/rows?min_tariff=20')
+    assert status == 200 and etag and body
+    assert get(server, '/rows?min_tariff=20.0', {'If-None-Match': etag}) == (304, etag, b'')
+    assert get(server, '/rows?min_tariff=20', {'If-None-Match': '"other", ' + etag})[0] == 304
+    assert get(server, '/rows?min_tariff=25', {'If-None-Match': etag})[0] == 200
+
+
+@pytest.mark.parametrize('path, status', [
+    ('/nowhere', 404),
+    ('/rows?min_imports=abc', 400),
+    ('/rows?max_tariff=inf', 400),
+    ('/figure?highlight=maybe', 400),
+    ('/options?year=2024x', 400),
+    ('/options?year=2024', 400),  # year= needs the data store
+])
+def test_bad_queries(server, path, status):
+    code, _, body = get(server, path)
+    assert code == status
+    assert 'error' in json.loads(body)
+
+
+def test_missing_data_is_not_found(service, tmp_path):
+    service.csv_path = str(tmp_path / 'missing.csv')
+    server = start_server(service)
+    try:
+        status, _, body = get(server, '/options')
+    finally:
+        stop_server(server)
+    assert status == 404
+    assert 'missing.csv' in json.loads(body)['error']
+
+
+def test_unexpected_error_is_a_json_500(server, service, monkeypatch):
+    def fail(endpoint, params):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(service, 'respond', fail)
+    status, _, body = get(server, '/options')
+    assert status == 500
+    assert 'error' in json.loads(body)
+
+
+# Concurrent first requests for the same years load them once
+def test_concurrent_requests_load_once(service, monkeypatch):
+    loads = []
+    load = service._load
+    def slow_load(years):
+        loads.append(years)
+        time.sleep(0.05)
+        return load(years)
+    monkeypatch.setattr(service, '_load', slow_load)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.dataset())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == [()]
+    assert len(results) == 8 and all(result is results[0] for result in results)
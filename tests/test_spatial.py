@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tariff_map.spatial import FINEST_LEVEL, WORLD, GridPyramid, view_extent
+
+
+# Ports clumped around a few hubs, with some missing values
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(2)
+    hubs = np.array([[31.2, 121.5], [51.9, 4.5], [33.7, -118.3], [-33.9, 151.2], [64.8, -179.5], [65.0, 179.6]])
+    hub = rng.integers(0, len(hubs), 5000)
+    lats = np.clip(hubs[hub, 0] + rng.normal(0, 3, 5000), -90, 90)
+    lons = (hubs[hub, 1] + rng.normal(0, 3, 5000) + 180) % 360 - 180
+    imports = rng.lognormal(0, 2, 5000)
+    imports[rng.random(5000) < 0.1] = 0.0
+    imports[:20] = np.nan
+    lats[20:30] = np.nan
+    tariffs = rng.choice([0.0, 10.0, 25.0, np.nan], 5000)
+    return lats, lons, imports, tariffs
+
+
+# Cell of each point at a level, computed directly from its coordinates
+def cells_at(lats, lons, level):
+    cells = 1 << level
+    cols = np.clip(((lons + 180.0) / 360.0 * cells).astype(np.int64), 0, cells - 1)
+    rows = np.clip(((lats + 90.0) / 180.0 * cells).astype(np.int64), 0, cells - 1)
+    return rows * cells + cols
+
+
+@pytest.mark.parametrize('max_points', [1, 7, 50, 500, 10_000])
+def test_cluster_count_is_bounded_and_imports_are_kept(points, max_points):
+    lats, lons, imports, tariffs = points
+    clusters = GridPyramid(lats, lons, imports, tariffs).clusters(max_points=max_points)
+    located = np.isfinite(lats) & np.isfinite(lons) & np.isfinite(imports)
+    assert len(clusters['lat']) <= max_points
+    assert clusters['count'].sum() == located.sum()
+    np.testing.assert_allclose(clusters['imports'].sum(), imports[located].sum())
+
+
+# Clusters are the non-empty cells of the chosen level, at the imports-weighted center
+# (plain mean for cells without imports) with the imports-weighted tariff rate
+def test_clusters_are_weighted_cells(points):
+    lats, lons, imports, tariffs = points
+    clusters = GridPyramid(lats, lons, imports, tariffs).clusters(max_points=40)
+    level = clusters['level']
+    assert level is not None and len(clusters['lat']) <= 40
+
+    located = np.isfinite(lats) & np.isfinite(lons) & np.isfinite(imports)
+    frame = pd.DataFrame({'lat': lats, 'lon': lons, 'imports': imports, 'tariff': tariffs})[located]
+    frame['cell'] = cells_at(frame['lat'].to_numpy(), frame['lon'].to_numpy(), level)
+    total = frame.groupby('cell')['imports'].transform('sum')
+    frame['weight'] = np.where(total > 0, frame['imports'], 1.0)
+    frame['tariff_weight'] = np.where(frame['tariff'].notna(), frame['weight'], 0.0)
+    groups = frame.assign(
+        lat=frame['lat'] * frame['weight'], lon=frame['lon'] * frame['weight'],
+        tariff=frame['tariff'].fillna(0) * frame['tariff_weight']
+    ).groupby('cell')
+    sums = groups[['lat', 'lon', 'imports', 'tariff', 'weight', 'tariff_weight']].sum()
+    expected = pd.DataFrame({
+        'lat': sums['lat'] / sums['weight'],
+        'lon': sums['lon'] / sums['weight'],
+        'imports': sums['imports'],
+        'tariff': sums['tariff'] / sums['tariff_weight'].replace(0, np.nan),
+        'count': groups.size()
+    }).sort_values(['lat', 'lon'], ignore_index=True)
+
+    actual = pd.DataFrame({name: clusters[name] for name in expected.columns}).sort_values(['lat', 'lon'], ignore_index=True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+    # The level is the finest one that fits
+    finer = cells_at(frame['lat'].to_numpy(), frame['lon'].to_numpy(), level + 1)
+    assert level == FINEST_LEVEL or len(np.unique(finer)) > 40
+
+
+def test_few_points_are_returned_one_by_one(points):
+    lats, lons, imports, tariffs = points
+    rows = np.array([100, 200, 300, 10])  # row 10 has no location
+    clusters = GridPyramid(lats, lons, imports, tariffs).clusters(max_points=10, rows=rows)
+    assert clusters['level'] is None
+    assert sorted(clusters['row']) == [100, 200, 300]
+    np.testing.assert_array_equal(clusters['lat'], lats[clusters['row']])
+
+
+def test_extent_across_the_antimeridian(points):
+    lats, lons, imports, tariffs = points
+    extent = view_extent(center_lat=65.0, center_lon=180.0, scale=8.0)
+    lon_min, lon_max, lat_min, lat_max = extent
+    assert lon_min > 0 > lon_max  # wraps around
+    np.testing.assert_allclose((lon_min, lon_max, lat_min, lat_max), (157.5, -157.5, 53.75, 76.25))
+
+    clusters = GridPyramid(lats, lons, imports, tariffs).clusters(extent, max_points=10_000)
+    inside = (
+        np.isfinite(imports) & (lats >= lat_min) & (lats <= lat_max) &
+        ((lons >= lon_min) | (lons <= lon_max))
+    )
+    assert inside.sum() > 0
+    assert sorted(clusters['row']) == sorted(np.flatnonzero(inside))
+    assert ((clusters['lon'] >= lon_min) | (clusters['lon'] <= lon_max)).all()
+
+    # Clustered, the bubbles of both sides of the antimeridian are kept
+    clustered = GridPyramid(lats, lons, imports, tariffs).clusters(extent, max_points=5)
+    assert clustered['count'].sum() == inside.sum()
+    assert (clustered['lon'] > 0).any() and (clustered['lon'] < 0).any()
+
+
+def test_whole_world_extent():
+    assert view_extent() == WORLD
+    assert view_extent(scale=0.5) == WORLD
@@ -0,0 +1,11 @@
+import pandas as pd
+
+from tariff_map.table import DataTable
+
+
+# Categories merged from several files are not in alphabetical order
+def test_sort_by_categorical_column_is_alphabetical():
+    names = pd.Categorical(['Eswatini', 'Zzz New Land', None, 'Albania'], categories=['Zzz New Land', 'Eswatini', 'Albania'])
+    table = DataTable(pd.DataFrame({'CTYNAME': names}))
+    assert table.sort_order('CTYNAME').tolist() == [3, 0, 1, 2]
+    assert table.sort_order('CTYNAME', ascending=False).tolist() == [1, 0, 3, 2]
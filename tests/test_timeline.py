@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from tariff_map.countries import build_country_index
+from tariff_map.figure import create_tariff_animation
+from tariff_map.timeline import timeline_rates
+
+
+def import_data():
+    return pd.DataFrame({
+        'year': np.full(3, 2024, dtype=np.int16),
+        'CTY_CODE': np.array([5700, 1220, 4280], dtype=np.int32),
+        'CTYNAME': pd.Categorical(['China', 'Canada', 'Germany']),
+        'Imports ($B)': np.array([400.0, 300.0, 150.0], dtype=np.float32),
+        'Tariff Rate': np.array([20.0, 2.5, 12.3], dtype=np.float32),
+        'Geopolitical_swing_state': np.array([False, False, True])
+    })
+
+
+# China changes three times, Canada only from the second date, Germany never
+def schedule():
+    return pd.DataFrame({
+        'CTY_CODE': np.array([5700, 5700, 1220, 5700], dtype=np.int32),
+        'Effective Date': pd.to_datetime(['2025-04-05', '2025-04-10', '2025-04-10', '2025-05-14']),
+        'Tariff Rate': np.array([10.0, 125.0, 25.0, 30.0], dtype=np.float32)
+    })
+
+
+def test_rates_follow_latest_change_and_base_rate():
+    dates, rates = timeline_rates(import_data(), schedule())
+    assert [date.strftime('%Y-%m-%d') for date in dates] == ['2025-04-05', '2025-04-10', '2025-05-14']
+    assert rates.dtype == np.float32
+    np.testing.assert_array_equal(rates, np.array([
+        [10.0, 2.5, 12.3],    # Canada keeps its base rate until its first change
+        [125.0, 25.0, 12.3],
+        [30.0, 25.0, 12.3]    # Canada's change carries forward; Germany never changes
+    ], dtype=np.float32))
+
+
+def test_rates_of_selected_rows():
+    _, rates = timeline_rates(import_data(), schedule(), rows=np.array([2, 1]))
+    np.testing.assert_array_equal(rates[:, 0], np.float32(12.3))
+    np.testing.assert_array_equal(rates[:, 1], np.array([2.5, 25.0, 25.0], dtype=np.float32))
+
+
+def test_empty_schedule_has_no_dates():
+    dates, rates = timeline_rates(import_data(), schedule().iloc[:0])
+    assert len(dates) == 0
+    assert rates.shape == (0, 3)
+
+
+# Frames only replace marker colors, so every bubble trace's hover must round them
+def test_animation_hover_rounds_tariff_rates():
+    data = import_data()
+    country_index, _ = build_country_index(data)
+    fig = create_tariff_animation(data, schedule(), 0, 1000, [], country_index=country_index)
+    assert len(fig.frames) == 3
+    bubbles = [trace for trace in fig.data if trace.type == 'scattergeo']
+    assert bubbles
+    for trace in bubbles:
+        assert "Tariff Rate: %{marker.color:.4~f}%" in trace.hovertemplate
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from tariff_map import views
+from tariff_map.figure import FigureCache, filter_key
+from tariff_map.filtering import FilterIndex
+from tariff_map.views import cached_views, tariff_band_chart, view_slice
+
+
+# Count the charts built, by name
+@pytest.fixture
+def builds(monkeypatch):
+    built = []
+    for name, build in list(views.VIEW_BUILDERS.items()):
+        def counted(columns, _name=name, _build=build, **options):
+            built.append(_name)
+            return _build(columns, **options)
+        monkeypatch.setitem(views.VIEW_BUILDERS, name, counted)
+    return built
+
+
+def options(measure='imports', bin_width=5):
+    return {'tariff_bands': {'measure': measure}, 'tariff_histogram': {'bin_width': bin_width}, 'swing_comparison': {}}
+
+
+def test_only_the_chart_whose_option_changed_is_rebuilt(data, builds):
+    index, cache = FilterIndex(data), FigureCache()
+    key = filter_key('data', 0.0, 50.0, 0.0, 55.0, (), index)
+    rows = index.rows(0.0, 50.0, 0.0, 55.0, ())
+
+    first = cached_views(cache, key, data, rows, options())
+    assert sorted(builds) == sorted(views.VIEW_BUILDERS)
+
+    builds.clear()
+    again = cached_views(cache, key, data, rows, options())
+    assert builds == []
+    assert all(again[name] is first[name] for name in first)
+
+    changed = cached_views(cache, key, data, rows, options(bin_width=10))
+    assert builds == ['tariff_histogram']
+    assert changed['tariff_bands'] is first['tariff_bands']
+    assert changed['swing_comparison'] is first['swing_comparison']
+
+    # Back to the first option: still cached
+    builds.clear()
+    assert cached_views(cache, key, data, rows, options())['tariff_histogram'] is first['tariff_histogram']
+    assert builds == []
+
+    # Other rows or another data version rebuild every chart
+    other = filter_key('data', 10.0, 50.0, 0.0, 55.0, (), index)
+    cached_views(cache, other, data, index.rows(10.0, 50.0, 0.0, 55.0, ()), options())
+    assert sorted(builds) == sorted(views.VIEW_BUILDERS)
+    builds.clear()
+    cached_views(cache, key, data, rows, options(), data_version=2)
+    assert sorted(builds) == sorted(views.VIEW_BUILDERS)
+
+
+def test_tariff_bands_sum_imports_and_countries(data):
+    rows = FilterIndex(data).rows(-np.inf, np.inf, -np.inf, np.inf, ())
+    columns = view_slice(data, rows)
+    band_imports = tariff_band_chart(columns).data[0]
+    band_counts = tariff_band_chart(columns, measure='countries').data[0]
+    np.testing.assert_allclose(sum(band_imports.x), np.nansum(data['Imports ($B)'].take(rows).to_numpy(dtype=float)))
+    assert sum(band_counts.x) == len(rows)